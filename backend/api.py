@@ -0,0 +1,791 @@
+"""HTTP routes and CLI commands, registered on the app by create_app()"""
+
+from flask import Blueprint, current_app, request, jsonify, Response, url_for, stream_with_context
+from datetime import date, datetime
+import io
+import json
+import os
+import click
+from sqlalchemy.orm.exc import StaleDataError
+
+from models import db, Agreement, Member, GenerationJob
+from services.document_generator import DocumentGenerator
+from services.html_sections import render_preview, sections_affected_by
+from services.instrumentation import phase
+from services.jobs import job_queue, job_to_dict, QueueFullError
+from services.pagination import encode_cursor, keyset_after, page_size
+from services.patching import (
+    PatchError, merge_patch, assign_changed, agreement_field_values, member_field_values, validate_member_diff
+)
+from services.query_counter import query_budget
+from services import repository
+from services.render_cache import render_cache, document_key
+from services.revisions import (
+    RevisionNotFound, record_revision, edit_delta, list_revisions, states_at, state_to_dict, diff_states
+)
+from services.bulk_import import import_ndjson, agreement_values, member_values, DEFAULT_CHUNK_SIZE
+from services.batch import iter_batch_zip
+from services.mail_merge import MailMerge, TemplateNotFound
+from services.cap_table import get_cap_table, cap_table_to_dict, check_cap_tables
+from services.capital_calls import (
+    ReportError, DETAIL_COLUMNS, report_filters, summary_query, totals_query, detail_query,
+    stream_rows, iter_detail_rows
+)
+from services.schema import upgrade_schema
+from services.search import (
+    SearchUnavailable, InvalidSearchQuery, search, index_agreement, affects_index, rebuild_index,
+    create_index as create_search_index
+)
+from services.sections import SECTIONS
+from services.snapshot import agreement_to_dict, agreement_from_payload
+from services.template_registry import template_registry, TemplateExistsError, TemplateValidationError
+from services.streaming import buffer_size, iter_file, iter_csv, iter_ndjson, content_disposition
+
+# cli_group=None puts the commands at the top level: `flask init-db`, not `flask api init-db`
+bp = Blueprint('api', __name__, cli_group=None)
+
+@bp.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()})
+
+# Date range filters accepted by the listing: query parameter prefix -> (column, parser)
+AGREEMENT_DATE_FILTERS = {
+    'created': (Agreement.created_at, datetime.fromisoformat),
+    'updated': (Agreement.updated_at, datetime.fromisoformat),
+    'formation': (Agreement.formation_date, date.fromisoformat),
+    'effective': (Agreement.effective_date, date.fromisoformat)
+}
+
+@bp.route('/api/agreements', methods=['GET'])
+@query_budget(1)
+def get_agreements():
+    limit = page_size(request.args.get('limit', type=int))
+    
+    # Only the listed columns are selected; data and relationships are never loaded
+    query = Agreement.query.with_entities(
+        Agreement.id, Agreement.company_name, Agreement.created_at, Agreement.updated_at
+    )
+    
+    if request.args.get('state'):
+        query = query.filter(Agreement.state == request.args['state'])
+    if request.args.get('manager_name'):
+        query = query.filter(Agreement.manager_name == request.args['manager_name'])
+    
+    try:
+        for prefix, (column, parse) in AGREEMENT_DATE_FILTERS.items():
+            if request.args.get(f'{prefix}_from'):
+                query = query.filter(column >= parse(request.args[f'{prefix}_from']))
+            if request.args.get(f'{prefix}_to'):
+                query = query.filter(column <= parse(request.args[f'{prefix}_to']))
+        if request.args.get('cursor'):
+            query = query.filter(keyset_after(Agreement.updated_at, Agreement.id, request.args['cursor']))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    rows = query.order_by(Agreement.updated_at.desc(), Agreement.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    response = jsonify([{
+        'id': a.id,
+        'company_name': a.company_name,
+        'created_at': a.created_at.isoformat(),
+        'updated_at': a.updated_at.isoformat()
+    } for a in rows])
+    
+    # The body stays a plain list; the next page is advertised in headers
+    if has_more:
+        next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(".get_agreements", **args)}>; rel="next"'
+    return response
+
+@bp.route('/api/agreements', methods=['POST'])
+def create_agreement():
+    data = request.json
+    
+    agreement = Agreement(**agreement_values(data))
+    
+    db.session.add(agreement)
+    
+    # Add members
+    for member_data in data.get('members', []):
+        member = Member(agreement=agreement, **member_values(member_data))
+        db.session.add(member)
+    
+    db.session.flush()
+    record_revision(agreement)
+    index_agreement(agreement)
+    db.session.commit()
+    
+    return jsonify({
+        'id': agreement.id,
+        'company_name': agreement.company_name,
+        'message': 'Agreement created successfully'
+    }), 201
+
+@bp.route('/api/agreements/import', methods=['POST'])
+def import_agreements():
+    """Stream NDJSON agreements in and a per-line NDJSON report back out"""
+    chunk_size = request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int)
+    
+    def report():
+        created = failed = 0
+        for entry in import_ndjson(request.stream, chunk_size=max(chunk_size, 1)):
+            if entry['status'] == 'created':
+                created += 1
+            else:
+                failed += 1
+            yield json.dumps(entry) + '\n'
+        yield json.dumps({'summary': {'created': created, 'failed': failed}}) + '\n'
+    
+    return Response(stream_with_context(report()), mimetype='application/x-ndjson')
+
+@bp.route('/api/search', methods=['GET'])
+@query_budget(1)
+def search_agreements():
+    """Ranked full-text search; page with ``offset`` (the response gives ``next_offset``)"""
+    limit = page_size(request.args.get('limit', type=int))
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    try:
+        rows = search(request.args.get('q', ''), limit + 1, offset)
+    except InvalidSearchQuery as exc:
+        return jsonify({'error': str(exc)}), 400
+    except SearchUnavailable as exc:
+        return jsonify({'error': str(exc)}), 501
+    
+    return jsonify({
+        'results': [{
+            'id': row['id'],
+            'company_name': row['company_name'],
+            'manager_name': row['manager_name'],
+            'state': row['state'],
+            'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None,
+            'score': row['score'],
+            'snippet': row['snippet']
+        } for row in rows[:limit]],
+        'next_offset': offset + limit if len(rows) > limit else None
+    })
+
+@bp.route('/api/agreements/<int:agreement_id>', methods=['GET'])
+@query_budget(2)
+def get_agreement(agreement_id):
+    agreement = repository.get_agreement_or_404(agreement_id, 'view')
+    
+    return jsonify({
+        'id': agreement.id,
+        'company_name': agreement.company_name,
+        'state': agreement.state,
+        'formation_date': agreement.formation_date.isoformat(),
+        'effective_date': agreement.effective_date.isoformat(),
+        'manager_name': agreement.manager_name,
+        'manager_entity': agreement.manager_entity,
+        'version': agreement.version,
+        'data': agreement.data,
+        'members': [{
+            'id': m.id,
+            'name': m.name,
+            'entity_name': m.entity_name,
+            'class': m.member_class,
+            'units': m.units,
+            'capital_commitment': m.capital_commitment,
+            'percentage_interest': m.percentage_interest
+        } for m in agreement.members]
+    })
+
+@bp.route('/api/agreements/<int:agreement_id>', methods=['PUT'])
+def update_agreement(agreement_id):
+    """Replace the agreement's data. An If-Match version is optional; a concurrent save gives 409"""
+    agreement = Agreement.query.get_or_404(agreement_id)
+    data = request.json
+    if request.if_match and not request.if_match.contains(str(agreement.version)):
+        return jsonify({'error': 'Agreement was modified', 'version': agreement.version}), 409
+    old_data = agreement.data or {}
+    
+    changed = assign_changed(agreement, {
+        'company_name': data.get('company_name', agreement.company_name),
+        'state': data.get('state', agreement.state),
+        'manager_name': data.get('manager_name', agreement.manager_name)
+    })
+    agreement.data = data
+    agreement.updated_at = datetime.utcnow()
+    
+    try:
+        db.session.flush()
+        record_revision(agreement, edit_delta(agreement, fields=changed, old_data=old_data))
+        if data != old_data or affects_index(changed):
+            index_agreement(agreement)
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'Agreement was modified'}), 409
+    _agreement_changed(agreement)
+    
+    response = jsonify({'message': 'Agreement updated successfully', 'version': agreement.version})
+    response.set_etag(str(agreement.version))
+    return response
+
+@bp.route('/api/agreements/<int:agreement_id>', methods=['PATCH'])
+def patch_agreement(agreement_id):
+    """Partial update: column fields, a JSON merge patch for data, and a member diff.
+    
+    The client sends the version it last saw (``version`` in the body or
+    an If-Match header); a stale version is rejected with 409.
+    """
+    agreement = repository.get_agreement_or_404(agreement_id, 'summary')
+    patch = request.json or {}
+    if not isinstance(patch, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 422
+    
+    expected_version = patch.get('version')
+    if expected_version is None and request.if_match:
+        expected_version = next(iter(request.if_match.as_set()), None)
+    if expected_version is None:
+        return jsonify({'error': 'A version (or If-Match header) is required'}), 428
+    if str(expected_version) != str(agreement.version):
+        return jsonify({'error': 'Agreement was modified', 'version': agreement.version}), 409
+    
+    member_diff = patch.get('members') or {}
+    try:
+        if 'data' in patch and not isinstance(patch['data'], dict):
+            raise PatchError('data must be a JSON merge patch object')
+        validate_member_diff(member_diff)
+    except PatchError as exc:
+        return jsonify({'error': str(exc)}), 422
+    
+    # Only the members named in the diff are loaded
+    touched_ids = [m.get('id') for m in member_diff.get('update', [])] + list(member_diff.get('remove', []))
+    existing = {
+        m.id: m for m in Member.query.filter(
+            Member.agreement_id == agreement.id, Member.id.in_(touched_ids)
+        )
+    } if touched_ids else {}
+    missing = [i for i in touched_ids if i not in existing]
+    if missing:
+        return jsonify({'error': 'Unknown member ids', 'ids': missing}), 422
+    
+    try:
+        changed = assign_changed(agreement, agreement_field_values(patch.get('fields') or {}))
+        
+        old_data = agreement.data or {}
+        if 'data' in patch:
+            data = merge_patch(old_data, patch['data'])
+            if data != old_data:
+                agreement.data = data
+                changed.append('data')
+        
+        added = []
+        for i, member_data in enumerate(member_diff.get('add', [])):
+            if not member_data.get('name') or not member_data.get('class'):
+                raise PatchError('New members need a name and class')
+            member = Member(agreement_id=agreement.id, **member_field_values(member_data, f'members.add[{i}]'))
+            db.session.add(member)
+            added.append(member)
+        
+        updated = {}
+        for i, member_data in enumerate(member_diff.get('update', [])):
+            member = existing[member_data['id']]
+            values = member_field_values(member_data, f'members.update[{i}]')
+            updated.setdefault(member, []).extend(assign_changed(member, values))
+        
+        for member_id in member_diff.get('remove', []):
+            db.session.delete(existing[member_id])
+    except PatchError as exc:
+        db.session.rollback()
+        return jsonify({'error': str(exc)}), 422
+    
+    if not (changed or added or any(updated.values()) or member_diff.get('remove')):
+        db.session.rollback()
+        return jsonify({'version': agreement.version, 'changed': []})
+    
+    # Member-only edits still bump the agreement's version
+    agreement.updated_at = datetime.utcnow()
+    try:
+        db.session.flush()
+        record_revision(agreement, edit_delta(
+            agreement,
+            fields=[f for f in changed if f != 'data'],
+            old_data=old_data if 'data' in changed else None,
+            added=added,
+            updated=updated,
+            removed=member_diff.get('remove', [])
+        ))
+        if affects_index(changed, updated.values(), bool(added or member_diff.get('remove'))):
+            index_agreement(agreement)
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'Agreement was modified'}), 409
+    _agreement_changed(agreement)
+    
+    response = jsonify({
+        'version': agreement.version,
+        'changed': changed,
+        'members': {
+            'added': [m.id for m in added],
+            'updated': [m.id for m, attrs in updated.items() if attrs],
+            'removed': list(member_diff.get('remove', []))
+        }
+    })
+    response.set_etag(str(agreement.version))
+    return response
+
+def _agreement_changed(agreement):
+    """Drop derived state that depends on the agreement's contents"""
+    render_cache.invalidate_agreement(agreement.id)
+
+@bp.route('/api/agreements/<int:agreement_id>/preview', methods=['GET'])
+@query_budget(2)
+def preview_agreement(agreement_id):
+    agreement = repository.get_agreement_or_404(agreement_id, 'view')
+    changed = [f for f in request.args.get('changed', '').split(',') if f]
+    return _preview_response(agreement, changed)
+
+@bp.route('/api/preview', methods=['POST'])
+def preview_draft():
+    """Preview an unsaved agreement body without touching the database"""
+    payload = request.json or {}
+    try:
+        agreement = agreement_from_payload(payload)
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+    changed = payload.get('changed') or []
+    if not isinstance(changed, list) or not all(isinstance(field, str) for field in changed):
+        return jsonify({'error': 'changed must be a list of field names'}), 400
+    return _preview_response(agreement, changed)
+
+def _preview_response(agreement, changed):
+    """HTML for every section, or only those that read one of the changed fields"""
+    sections = sections_affected_by(changed) if changed else SECTIONS
+    rendered = render_preview(agreement, sections)
+    
+    if request.args.get('format') == 'html':
+        body = ''.join(fragment for _, fragment in rendered)
+        return Response(f'<article class="opag-preview">{body}</article>', mimetype='text/html')
+    return jsonify({'sections': [{'name': name, 'html': fragment} for name, fragment in rendered]})
+
+@bp.route('/api/agreements/<int:agreement_id>/revisions', methods=['GET'])
+@query_budget(2)
+def get_agreement_revisions(agreement_id):
+    """Revision metadata, newest first; pass ``before`` to page back through history"""
+    Agreement.query.with_entities(Agreement.id).filter_by(id=agreement_id).first_or_404()
+    limit = page_size(request.args.get('limit', type=int))
+    revisions = list_revisions(agreement_id, before=request.args.get('before', type=int), limit=limit)
+    return jsonify({
+        'revisions': [{
+            'revision': r.revision,
+            'kind': r.kind,
+            'size': r.size,
+            'changed': r.changed,
+            'created_at': r.created_at.isoformat()
+        } for r in revisions],
+        'next_before': revisions[-1].revision if len(revisions) == limit else None
+    })
+
+@bp.route('/api/agreements/<int:agreement_id>/revisions/<int:revision>', methods=['GET'])
+@query_budget(2)
+def get_agreement_revision(agreement_id, revision):
+    """The agreement as it was at a revision, rebuilt from its nearest checkpoint"""
+    try:
+        state = states_at(agreement_id, [revision])[revision]
+    except RevisionNotFound as exc:
+        return jsonify({'error': str(exc)}), 404
+    return jsonify(state_to_dict(revision, state))
+
+@bp.route('/api/agreements/<int:agreement_id>/diff', methods=['GET'])
+@query_budget(4)
+def diff_agreement_revisions(agreement_id):
+    """Field, data and member differences between revisions ``from`` and ``to`` (default: latest)"""
+    start = request.args.get('from', type=int)
+    end = request.args.get('to', type=int)
+    if end is None:
+        latest = Agreement.query.with_entities(Agreement.version).filter_by(id=agreement_id).first_or_404()
+        end = latest.version
+    if start is None:
+        start = end - 1
+    
+    try:
+        states = states_at(agreement_id, [start, end])
+    except RevisionNotFound as exc:
+        return jsonify({'error': str(exc)}), 404
+    return jsonify({'from': start, 'to': end, **diff_states(states[start], states[end])})
+
+@bp.route('/api/agreements/<int:agreement_id>/cap-table', methods=['GET'])
+@query_budget(2)
+def get_agreement_cap_table(agreement_id):
+    """Per-class totals from the materialised cap table; cost does not grow with member count"""
+    entries = get_cap_table(agreement_id)
+    if not entries:
+        # No rows means no members, or no such agreement
+        Agreement.query.with_entities(Agreement.id).filter_by(id=agreement_id).first_or_404()
+    return jsonify(cap_table_to_dict(agreement_id, entries))
+
+@bp.route('/api/agreements/<int:agreement_id>/waterfall', methods=['POST'])
+@query_budget(2)
+def simulate_waterfall(agreement_id):
+    """Distributions over every combination of exit_values and years.
+
+    Per-scenario tier amounts (and, with include_distributions, the full
+    scenario-by-member matrix) are returned while they fit within
+    WATERFALL_MAX_OUTPUT_CELLS; per-member summaries are always returned.
+    """
+    # NumPy is only imported by the workers that actually run simulations
+    from services.waterfall import (
+        WaterfallInputError, run_agreement_waterfall, parse_costs, parse_number, parse_range, to_json_list
+    )
+    
+    agreement = repository.get_agreement_or_404(agreement_id, 'render')
+    data = request.json or {}
+    max_scenarios = current_app.config['WATERFALL_MAX_SCENARIOS']
+    max_cells = current_app.config['WATERFALL_MAX_OUTPUT_CELLS']
+    
+    try:
+        if not isinstance(data, dict):
+            raise WaterfallInputError('Request body must be a JSON object')
+        if 'exit_values' not in data:
+            raise WaterfallInputError('exit_values is required')
+        exit_values = parse_range(data['exit_values'], 'exit_values', max_scenarios)
+        years = parse_range(data.get('years', 5), 'years', max_scenarios)
+        if exit_values.size * years.size > max_scenarios:
+            raise WaterfallInputError(f'Simulations are limited to {max_scenarios} scenarios')
+        cost_rate, fixed_costs = parse_costs(data.get('transaction_costs'))
+        carry_percentage, preferred_return = (
+            None if data.get(key) is None else parse_number(data[key], key)
+            for key in ('carry_percentage', 'preferred_return')
+        )
+        with phase('simulate'):
+            result = run_agreement_waterfall(
+                agreement, exit_values, years,
+                cost_rate=cost_rate,
+                fixed_costs=fixed_costs,
+                carry_percentage=carry_percentage,
+                preferred_return=preferred_return
+            )
+            summary = result.member_summary()
+    except (WaterfallInputError, TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    members = agreement.members
+    response = {
+        'agreement_id': agreement.id,
+        'scenario_count': result.scenario_count,
+        'member_count': result.member_count,
+        'members': [{
+            'id': m.id,
+            'name': m.name,
+            'class': m.member_class,
+            'capital_commitment': m.capital_commitment,
+            'mean_distribution': mean,
+            'min_distribution': low,
+            'max_distribution': high,
+            'mean_multiple': multiple
+        } for m, mean, low, high, multiple in zip(
+            members, to_json_list(summary['mean']), to_json_list(summary['min']),
+            to_json_list(summary['max']), to_json_list(summary['mean_multiple'], 4)
+        )]
+    }
+    
+    with phase('serialize'):
+        if result.scenario_count * (len(result.tiers) + 2) <= max_cells:
+            response['scenarios'] = {'exit_value': to_json_list(result.exit_values), 'years': to_json_list(result.years)}
+            response['scenarios'].update((tier, to_json_list(amounts)) for tier, amounts in result.tiers.items())
+        if data.get('include_distributions'):
+            if result.scenario_count * result.member_count > max_cells:
+                return jsonify({'error': f'Distribution matrix exceeds {max_cells} cells; narrow the grid'}), 400
+            response['distributions'] = to_json_list(result.member_distributions())
+    
+    return jsonify(response)
+
+@bp.route('/api/generate-doc/<int:agreement_id>', methods=['POST'])
+@query_budget(2)
+def generate_document(agreement_id):
+    agreement = repository.get_agreement_or_404(agreement_id, 'render')
+    template_name = request.json.get('template', 'default')
+    
+    generator = DocumentGenerator()
+    with phase('hash'):
+        etag = document_key(agreement, generator.template_version(template_name))
+    
+    # The client already holds this exact rendering
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    download_name = f"{agreement.company_name}_Operating_Agreement_{datetime.now().strftime('%Y%m%d')}.docx"
+    
+    with phase('cache'):
+        content = render_cache.get(agreement.id, etag)
+    if content is not None:
+        return _docx_response(io.BytesIO(content), download_name, etag)
+    
+    # Reject up front rather than rendering a document with blanks
+    template_info = template_registry.get(template_name)
+    if template_info is not None and not request.json.get('allow_missing'):
+        missing = generator.missing_variables(agreement, template_info.variables)
+        if missing:
+            return jsonify({
+                'error': 'Template uses variables this agreement does not provide',
+                'missing_variables': sorted(missing)
+            }), 422
+    
+    buffer = generator.generate_to_buffer(
+        agreement, template_name, spool_threshold=current_app.config['DOC_SPOOL_THRESHOLD']
+    )
+    # Only documents that stayed in memory are cached; larger ones stream from the spool file
+    if buffer_size(buffer) <= current_app.config['DOC_SPOOL_THRESHOLD']:
+        with phase('cache'):
+            render_cache.put(agreement.id, etag, buffer.read())
+    
+    return _docx_response(buffer, download_name, etag)
+
+def _docx_response(fileobj, download_name, etag):
+    """Stream a generated document in chunks without a Content-Length"""
+    response = Response(
+        iter_file(fileobj, current_app.config['DOC_STREAM_CHUNK_SIZE']),
+        mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        direct_passthrough=True
+    )
+    disposition, names = content_disposition(download_name)
+    response.headers.set('Content-Disposition', disposition, **names)
+    response.set_etag(etag)
+    return response
+
+@bp.route('/api/generate-docs/batch', methods=['POST'])
+def generate_documents_batch():
+    data = request.json or {}
+    template_name = data.get('template', 'default')
+    agreement_ids = data.get('agreement_ids')
+    filters = data.get('filter')
+    
+    if not agreement_ids and not filters:
+        return jsonify({'error': 'Provide agreement_ids or a filter'}), 400
+    
+    query = repository.agreement_query('render')
+    if agreement_ids:
+        query = query.filter(Agreement.id.in_(agreement_ids))
+    if filters:
+        if filters.get('state'):
+            query = query.filter(Agreement.state == filters['state'])
+        if filters.get('manager_name'):
+            query = query.filter(Agreement.manager_name == filters['manager_name'])
+    
+    limit = current_app.config['BATCH_MAX_DOCUMENTS']
+    agreements = query.order_by(Agreement.id).limit(limit + 1).all()
+    if len(agreements) > limit:
+        return jsonify({'error': f'Batch is limited to {limit} documents'}), 400
+    
+    snapshots = [agreement_to_dict(a) for a in agreements]
+    found_ids = {a.id for a in agreements}
+    missing_ids = [i for i in (agreement_ids or []) if i not in found_ids]
+    
+    response = Response(iter_batch_zip(snapshots, template_name, missing_ids), mimetype='application/zip')
+    disposition, names = content_disposition(f"Operating_Agreements_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+    response.headers.set('Content-Disposition', disposition, **names)
+    return response
+
+@bp.route('/api/agreements/<int:agreement_id>/mail-merge', methods=['POST'])
+@query_budget(2)
+def generate_member_documents(agreement_id):
+    """One personalised document per member, streamed as a ZIP"""
+    agreement = repository.get_agreement_or_404(agreement_id, 'render')
+    data = request.json or {}
+    template_name = data.get('template', 'default')
+    member_ids = data.get('member_ids')
+    if member_ids is not None and not isinstance(member_ids, list):
+        return jsonify({'error': 'member_ids must be a list'}), 400
+    
+    try:
+        merge = MailMerge(agreement, template_name, member_ids)
+    except TemplateNotFound as exc:
+        return jsonify({'error': str(exc)}), 404
+    if not merge.member_contexts:
+        return jsonify({'error': 'No members to merge', 'missing_member_ids': merge.missing_member_ids}), 400
+    
+    template_info = template_registry.get(template_name)
+    if template_info is not None and not data.get('allow_missing'):
+        missing = merge.missing_variables(template_info.variables)
+        if missing:
+            return jsonify({
+                'error': 'Template uses variables this agreement does not provide',
+                'missing_variables': sorted(missing)
+            }), 422
+    
+    response = Response(merge.iter_zip(), mimetype='application/zip')
+    disposition, names = content_disposition(
+        f"{agreement.company_name}_Member_Documents_{datetime.now().strftime('%Y%m%d')}.zip"
+    )
+    response.headers.set('Content-Disposition', disposition, **names)
+    return response
+
+@bp.route('/api/jobs', methods=['POST'])
+def create_generation_job():
+    data = request.json or {}
+    agreement = Agreement.query.get_or_404(data.get('agreement_id'))
+    
+    try:
+        job = job_queue.enqueue(agreement.id, data.get('template', 'default'))
+    except QueueFullError as exc:
+        return jsonify({'error': str(exc)}), 503
+    
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}',
+        'result_url': f'/api/jobs/{job.id}/result'
+    }), 202
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+@query_budget(1)
+def get_generation_job(job_id):
+    job = GenerationJob.query.get_or_404(job_id)
+    return jsonify(job_to_dict(job))
+
+@bp.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_generation_job_result(job_id):
+    job = GenerationJob.query.get_or_404(job_id)
+    if job.status != 'succeeded':
+        return jsonify({'error': 'Job has no result', 'status': job.status}), 409
+    
+    agreement = Agreement.query.get_or_404(job.agreement_id)
+    download_name = f"{agreement.company_name}_Operating_Agreement_{job.finished_at.strftime('%Y%m%d')}.docx"
+    return _docx_response(io.BytesIO(job.result), download_name, job.id)
+
+@bp.route('/api/templates', methods=['GET'])
+def get_templates():
+    return jsonify([t.to_dict() for t in template_registry.list()])
+
+@bp.route('/api/templates', methods=['POST'])
+def upload_template():
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': 'Upload the template as a "file" form field'}), 400
+    
+    name = request.form.get('name') or os.path.splitext(upload.filename or '')[0]
+    content = upload.read(current_app.config['TEMPLATE_MAX_UPLOAD_BYTES'] + 1)
+    if len(content) > current_app.config['TEMPLATE_MAX_UPLOAD_BYTES']:
+        return jsonify({'error': 'Template is too large'}), 413
+    
+    overwrite = request.form.get('overwrite', '').lower() in ('1', 'true', 'yes')
+    try:
+        info = template_registry.register(name, content, overwrite=overwrite)
+    except TemplateValidationError as exc:
+        return jsonify({'error': str(exc)}), 422
+    except TemplateExistsError as exc:
+        return jsonify({'error': str(exc)}), 409
+    
+    return jsonify(info.to_dict()), 201
+
+REPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+@bp.route('/api/reports/capital-calls', methods=['GET'])
+@query_budget(2)
+def capital_call_summary():
+    """Committed, paid, outstanding and overdue amounts grouped by agreement, member, class or month"""
+    group_by = request.args.get('group_by', 'agreement')
+    output = request.args.get('format', 'json')
+    try:
+        filters = report_filters(request.args)
+        stmt = summary_query(group_by, filters)
+    except ReportError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    if output != 'json':
+        return _report_response(output, list(stmt.selected_columns.keys()), stream_rows(stmt),
+                                f'capital_calls_by_{group_by}')
+    
+    totals = db.session.execute(totals_query(filters)).mappings().one()
+    groups = db.session.execute(stmt).mappings().all()
+    return jsonify({
+        'as_of': filters['as_of'].isoformat(),
+        'group_by': group_by,
+        'totals': _report_dict(totals),
+        'groups': [_report_dict(g) for g in groups]
+    })
+
+@bp.route('/api/reports/capital-calls/export', methods=['GET'])
+def capital_call_export():
+    """One row per capital call, streamed from a server-side cursor"""
+    output = request.args.get('format', 'csv')
+    try:
+        filters = report_filters(request.args)
+        stmt = detail_query(request.args.get('status', 'all'), filters)
+    except ReportError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return _report_response(output, DETAIL_COLUMNS, iter_detail_rows(stmt, filters['as_of']), 'capital_calls')
+
+def _report_dict(row):
+    return {key: value.isoformat() if isinstance(value, date) else value for key, value in row.items()}
+
+def _report_response(output, columns, rows, name):
+    if output not in REPORT_FORMATS:
+        return jsonify({'error': f'format must be one of: json, {", ".join(REPORT_FORMATS)}'}), 400
+    encode, mimetype = REPORT_FORMATS[output]
+    response = Response(stream_with_context(encode(columns, rows)), mimetype=mimetype)
+    disposition, names = content_disposition(f"{name}_{datetime.now().strftime('%Y%m%d')}.{output}")
+    response.headers.set('Content-Disposition', disposition, **names)
+    return response
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create any missing tables and indexes, including the full-text search table, and upgrade existing ones"""
+    db.create_all()
+    added = upgrade_schema()
+    create_search_index()
+    db.session.commit()
+    for name in added:
+        click.echo(f'Added {name}', err=True)
+    click.echo('Database initialised', err=True)
+
+@bp.cli.command('import-agreements')
+@click.argument('path', type=click.File('rb'))
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True, help='Records per bulk insert')
+@click.option('--report', 'report_file', type=click.File('w'), default='-', help='Where to write the NDJSON report')
+def import_agreements_command(path, chunk_size, report_file):
+    """Bulk-import agreements from an NDJSON file (use - for stdin)"""
+    created = failed = 0
+    for entry in import_ndjson(path, chunk_size=chunk_size):
+        if entry['status'] == 'created':
+            created += 1
+        else:
+            failed += 1
+        report_file.write(json.dumps(entry) + '\n')
+    click.echo(f'Imported {created} agreements, {failed} failed', err=True)
+
+@bp.cli.command('reindex-search')
+@click.option('--batch-size', default=1000, show_default=True, help='Agreements indexed per transaction')
+def reindex_search_command(batch_size):
+    """Rebuild the full-text search index from scratch"""
+    try:
+        indexed = rebuild_index(batch_size)
+    except SearchUnavailable as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f'Indexed {indexed} agreements', err=True)
+
+@bp.cli.command('purge-jobs')
+@click.option('--older-than', type=click.IntRange(min=1), default=None, help='Seconds since finishing (default: JOB_RESULT_TTL)')
+def purge_jobs_command(older_than):
+    """Delete finished generation jobs and their stored documents"""
+    purged = job_queue.purge_finished(older_than)
+    click.echo(f'Purged {purged} finished jobs', err=True)
+
+@bp.cli.command('check-cap-tables')
+@click.option('--agreement', 'agreement_ids', type=int, multiple=True, help='Only check these agreements')
+@click.option('--repair', is_flag=True, help='Rebuild mismatched cap tables from their members')
+def check_cap_tables_command(agreement_ids, repair):
+    """Recompute cap tables from members and report rows that have drifted"""
+    mismatches = check_cap_tables(list(agreement_ids) or None, repair=repair)
+    for mismatch in mismatches:
+        click.echo(json.dumps(mismatch))
+    affected = len({m['agreement_id'] for m in mismatches})
+    if repair:
+        click.echo(f'Repaired {affected} agreements', err=True)
+    else:
+        click.echo(f'{len(mismatches)} mismatched rows across {affected} agreements', err=True)
+        if mismatches:
+            raise SystemExit(1)
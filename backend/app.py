@@ -1,161 +1,97 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-import os
 from dotenv import load_dotenv
+import os
+import sys
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+# Services import models as a top-level module
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Database configuration
-# Handle Heroku's postgres:// to postgresql:// URL change
-database_url = os.getenv('DATABASE_URL', 'sqlite:///opag.db')
-if database_url.startswith('postgres://'):
-    database_url = database_url.replace('postgres://', 'postgresql://', 1)
+from api import bp
+from models import db
+from services.instrumentation import init_instrumentation
+from services.jobs import job_queue
+from services.query_counter import init_query_counter
+from services.schema import upgrade_schema
+from services.search import create_index as create_search_index
+from services.template_registry import template_registry
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() not in ('0', 'false', 'no')
+
+
+def load_config(app):
+    # Database configuration
+    # Handle Heroku's postgres:// to postgresql:// URL change
+    database_url = os.getenv('DATABASE_URL', 'sqlite:///opag.db')
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+
+    # Generated documents stay in memory below this size and spill to a temp file above it
+    app.config['DOC_SPOOL_THRESHOLD'] = int(os.getenv('DOC_SPOOL_THRESHOLD', str(8 * 1024 * 1024)))
+    app.config['DOC_STREAM_CHUNK_SIZE'] = int(os.getenv('DOC_STREAM_CHUNK_SIZE', str(64 * 1024)))
+    # 'warn' logs endpoints that exceed their query budget, 'strict' raises (for tests)
+    app.config['QUERY_BUDGET_MODE'] = os.getenv('QUERY_BUDGET_MODE', 'off')
+    # Server-Timing headers and /metrics; set INSTRUMENTATION_ENABLED=0 to remove the hooks entirely
+    app.config['INSTRUMENTATION_ENABLED'] = _env_flag('INSTRUMENTATION_ENABLED', '1')
+    app.config['TEMPLATE_SCAN_INTERVAL'] = float(os.getenv('TEMPLATE_SCAN_INTERVAL', '2'))
+    app.config['TEMPLATE_MAX_UPLOAD_BYTES'] = int(os.getenv('TEMPLATE_MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
+    app.config['BATCH_MAX_DOCUMENTS'] = int(os.getenv('BATCH_MAX_DOCUMENTS', '1000'))
+    # Waterfall simulation limits: total scenarios, and cells returned in per-scenario output
+    app.config['WATERFALL_MAX_SCENARIOS'] = int(os.getenv('WATERFALL_MAX_SCENARIOS', '1000000'))
+    app.config['WATERFALL_MAX_OUTPUT_CELLS'] = int(os.getenv('WATERFALL_MAX_OUTPUT_CELLS', '1000000'))
+    # Revision history stores a full checkpoint every N revisions and deltas in between
+    app.config['REVISION_CHECKPOINT_INTERVAL'] = int(os.getenv('REVISION_CHECKPOINT_INTERVAL', '20'))
+    # data keys included in the full-text search index (run `flask reindex-search` after changing)
+    app.config['SEARCH_DATA_KEYS'] = tuple(
+        k.strip() for k in os.getenv('SEARCH_DATA_KEYS', 'title,class_a_rights,class_b_rights,class_c_rights').split(',') if k.strip()
+    )
 
-app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+    # Background generation jobs (JOB_WORKERS=0 runs no workers in this process)
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', '2'))
+    app.config['JOB_QUEUE_MAX_DEPTH'] = int(os.getenv('JOB_QUEUE_MAX_DEPTH', '500'))
+    app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    # Finished jobs (and their rendered documents) are deleted this many seconds after finishing; 0 keeps them
+    app.config['JOB_RESULT_TTL'] = int(os.getenv('JOB_RESULT_TTL', str(24 * 60 * 60)))
 
-db = SQLAlchemy(app)
 
-# Import models and services after db initialization
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+def create_app(config=None):
+    """Build the Flask app.
 
-from models import Agreement, Member, CapitalCommitment, CapitalStructure
-from services.document_generator import DocumentGenerator
-
-# Create tables
-with app.app_context():
-    db.create_all()
-
-@app.route('/health', methods=['GET'])
-def health_check():
-    return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()})
-
-@app.route('/api/agreements', methods=['GET'])
-def get_agreements():
-    agreements = Agreement.query.all()
-    return jsonify([{
-        'id': a.id,
-        'company_name': a.company_name,
-        'created_at': a.created_at.isoformat(),
-        'updated_at': a.updated_at.isoformat()
-    } for a in agreements])
-
-@app.route('/api/agreements', methods=['POST'])
-def create_agreement():
-    data = request.json
-    
-    agreement = Agreement(
-        company_name=data['company_name'],
-        state=data.get('state', 'Delaware'),
-        formation_date=datetime.fromisoformat(data['formation_date']),
-        effective_date=datetime.fromisoformat(data['effective_date']),
-        manager_name=data['manager_name'],
-        manager_entity=data.get('manager_entity'),
-        principal_place_of_business=data.get('principal_place_of_business'),
-        registered_agent=data.get('registered_agent'),
-        purpose=data.get('purpose'),
-        data=data
-    )
-    
-    db.session.add(agreement)
-    
-    # Add members
-    for member_data in data.get('members', []):
-        member = Member(
-            agreement=agreement,
-            name=member_data['name'],
-            entity_name=member_data.get('entity_name'),
-            member_class=member_data['class'],
-            units=member_data.get('units', 0),
-            capital_commitment=member_data.get('capital_commitment', 0),
-            percentage_interest=member_data.get('percentage_interest', 0)
-        )
-        db.session.add(member)
-    
-    db.session.commit()
-    
-    return jsonify({
-        'id': agreement.id,
-        'company_name': agreement.company_name,
-        'message': 'Agreement created successfully'
-    }), 201
-
-@app.route('/api/agreements/<int:agreement_id>', methods=['GET'])
-def get_agreement(agreement_id):
-    agreement = Agreement.query.get_or_404(agreement_id)
-    
-    return jsonify({
-        'id': agreement.id,
-        'company_name': agreement.company_name,
-        'state': agreement.state,
-        'formation_date': agreement.formation_date.isoformat(),
-        'effective_date': agreement.effective_date.isoformat(),
-        'manager_name': agreement.manager_name,
-        'manager_entity': agreement.manager_entity,
-        'data': agreement.data,
-        'members': [{
-            'id': m.id,
-            'name': m.name,
-            'entity_name': m.entity_name,
-            'class': m.member_class,
-            'units': m.units,
-            'capital_commitment': m.capital_commitment,
-            'percentage_interest': m.percentage_interest
-        } for m in agreement.members]
-    })
-
-@app.route('/api/agreements/<int:agreement_id>', methods=['PUT'])
-def update_agreement(agreement_id):
-    agreement = Agreement.query.get_or_404(agreement_id)
-    data = request.json
-    
-    agreement.company_name = data.get('company_name', agreement.company_name)
-    agreement.state = data.get('state', agreement.state)
-    agreement.manager_name = data.get('manager_name', agreement.manager_name)
-    agreement.data = data
-    agreement.updated_at = datetime.utcnow()
-    
-    db.session.commit()
-    
-    return jsonify({'message': 'Agreement updated successfully'})
-
-@app.route('/api/generate-doc/<int:agreement_id>', methods=['POST'])
-def generate_document(agreement_id):
-    agreement = Agreement.query.get_or_404(agreement_id)
-    template_name = request.json.get('template', 'default')
-    
-    generator = DocumentGenerator()
-    file_path = generator.generate(agreement, template_name)
-    
-    return send_file(
-        file_path,
-        as_attachment=True,
-        download_name=f"{agreement.company_name}_Operating_Agreement_{datetime.now().strftime('%Y%m%d')}.docx",
-        mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-    )
+    Nothing here touches the database or starts threads: tables are created
+    with `flask init-db`, and generation job workers are started by the
+    process that serves requests (see gunicorn.conf.py and __main__ below).
+    """
+    app = Flask(__name__)
+    CORS(app, expose_headers=['ETag', 'Content-Disposition', 'Link', 'X-Next-Cursor', 'Server-Timing'])
+
+    load_config(app)
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    template_registry.init_app(app)
+    init_query_counter(app)
+    init_instrumentation(app)
+    job_queue.init_app(app)
+
+    app.register_blueprint(bp)
+    return app
 
-@app.route('/api/templates', methods=['GET'])
-def get_templates():
-    templates_dir = os.path.join(os.path.dirname(__file__), '..', 'templates')
-    templates = []
-    
-    if os.path.exists(templates_dir):
-        for file in os.listdir(templates_dir):
-            if file.endswith('.docx'):
-                templates.append({
-                    'name': file.replace('.docx', ''),
-                    'filename': file
-                })
-    
-    return jsonify(templates)
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        create_search_index()
+        db.session.commit()
+    job_queue.start()
+    app.run(debug=True, port=5001)
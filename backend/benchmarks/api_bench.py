@@ -0,0 +1,90 @@
+import os
+import tempfile
+import time
+
+from .synthetic import synthetic_snapshot, api_payload
+from .timing import measure, summarize
+
+LIST_SEED_AGREEMENTS = 200
+
+
+def _client(tmp_dir):
+    # The render cache singleton reads its directory from the environment at import time
+    os.environ['RENDER_CACHE_DIR'] = os.path.join(tmp_dir, 'render-cache')
+
+    from app import create_app
+    from models import db
+    from services.search import create_index
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}",
+        'JOB_WORKERS': 0,
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        create_index()
+        db.session.commit()
+    return app.test_client()
+
+
+def _check(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f'{response.request.method} {response.request.path} returned {response.status_code}: '
+                           f'{response.get_data(as_text=True)[:500]}')
+    return response
+
+
+def run(member_counts, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = _client(tmp_dir)
+        from services.render_cache import render_cache
+
+        for i in range(LIST_SEED_AGREEMENTS):
+            _check(client.post('/api/agreements', json=api_payload(synthetic_snapshot(3, seed=i, agreement_id=i))), 201)
+
+        results['api.list_agreements'] = measure(lambda: _check(client.get('/api/agreements?limit=50')), repeat=repeat * 4)
+
+        for count in member_counts:
+            label = f'{count}m'
+            payload = api_payload(synthetic_snapshot(count))
+            runs = repeat if count < 1000 else max(1, repeat // 2)
+
+            created = []
+            results[f'api.create_agreement.{label}'] = measure(
+                lambda: created.append(_check(client.post('/api/agreements', json=payload), 201).json['id']),
+                repeat=runs, warmup=0
+            )
+            agreement_id = created[-1]
+
+            results[f'api.get_agreement.{label}'] = measure(
+                lambda: _check(client.get(f'/api/agreements/{agreement_id}')), repeat=runs
+            )
+
+            samples = []
+            for _ in range(runs):
+                render_cache.invalidate_agreement(agreement_id)
+                start = time.perf_counter()
+                response = _check(client.post(f'/api/generate-doc/{agreement_id}', json={'template': 'default'}))
+                response.get_data()
+                samples.append(time.perf_counter() - start)
+            results[f'api.generate_doc.render.{label}'] = summarize(samples)
+            etag = response.headers['ETag']
+
+            results[f'api.generate_doc.cached.{label}'] = measure(
+                lambda: _check(client.post(f'/api/generate-doc/{agreement_id}', json={'template': 'default'})).get_data(),
+                repeat=runs
+            )
+            results[f'api.generate_doc.not_modified.{label}'] = measure(
+                lambda: _check(client.post(f'/api/generate-doc/{agreement_id}', json={'template': 'default'},
+                                           headers={'If-None-Match': etag}), 304),
+                repeat=runs
+            )
+
+            def patch():
+                version = _check(client.get(f'/api/agreements/{agreement_id}')).json['version']
+                _check(client.patch(f'/api/agreements/{agreement_id}',
+                                    json={'version': version, 'data': {'notes': time.time()}}))
+
+            results[f'api.get_and_patch.{label}'] = measure(patch, repeat=runs)
+    return results
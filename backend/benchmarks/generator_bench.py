@@ -0,0 +1,91 @@
+import io
+import tempfile
+
+from docx import Document
+
+from services import docx_packaging
+from services.document_generator import DocumentGenerator
+from services.docx_sections import fragment_cache
+from services.mail_merge import MailMerge
+from services.template_cache import template_cache
+
+from .synthetic import synthetic_agreement, write_benchmark_template
+from .timing import PhaseTimer, measure
+
+MAIL_MERGE_MAX_MEMBERS = 100
+
+
+def bench_template_path(agreement, generator, template_name, repeat):
+    """Context prep, render and save for a docxtpl template, timed separately.
+
+    save is python-docx rewriting the whole package; save_reuse copies the
+    parts the render left unchanged and save_store also stores the rest.
+    """
+    compiled = template_cache.get(template_name, generator.template_path(template_name))
+    timer = PhaseTimer()
+    for _ in range(repeat):
+        context = timer.time('context', generator.prepare_context, agreement)
+        doc = timer.time('render', compiled.render, context)
+        timer.time('save', doc.save, io.BytesIO())
+        timer.time('save_reuse', docx_packaging.save, doc.docx, io.BytesIO(), compiled.package)
+        timer.time('save_store', docx_packaging.save, doc.docx, io.BytesIO(), compiled.package, 0)
+    return timer
+
+
+def bench_scratch_path(agreement, generator, repeat, warm):
+    """Build and save for the from-scratch document, with or without cached fragments"""
+    timer = PhaseTimer()
+    for _ in range(repeat):
+        if not warm:
+            fragment_cache.clear()
+        doc = timer.time('build', _build_scratch, generator, agreement)
+        timer.time('save', doc.save, io.BytesIO())
+    return timer
+
+
+def _build_scratch(generator, agreement):
+    doc = Document()
+    generator._create_document_from_scratch(doc, agreement)
+    return doc
+
+
+def run(member_counts, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as templates_dir:
+        generator = DocumentGenerator()
+        generator.templates_dir = templates_dir
+        write_benchmark_template(generator.template_path('benchmark'))
+        results.update(measure_template_parse(generator))
+
+        for count in member_counts:
+            for large_data in (False, True):
+                label = f'{count}m.{"large" if large_data else "small"}'
+                agreement = synthetic_agreement(count, large_data=large_data)
+                # The biggest documents are slow enough that fewer runs suffice
+                runs = repeat if count < 1000 else max(1, repeat // 2)
+
+                results.update(bench_template_path(agreement, generator, 'benchmark', runs).results(f'generator.template.{label}'))
+                results.update(bench_scratch_path(agreement, generator, runs, warm=False).results(f'generator.scratch_cold.{label}'))
+                bench_scratch_path(agreement, generator, 1, warm=True)
+                results.update(bench_scratch_path(agreement, generator, runs, warm=True).results(f'generator.scratch_warm.{label}'))
+
+                results[f'generator.end_to_end.{label}'] = measure(
+                    lambda: generator.generate(agreement, 'benchmark', output=io.BytesIO()), repeat=runs
+                )
+                # One document per member, so only for agreements small enough to merge in full
+                if count <= MAIL_MERGE_MAX_MEMBERS:
+                    results[f'generator.mail_merge.{label}'] = measure(
+                        lambda: b''.join(MailMerge(agreement, 'benchmark', generator=generator).iter_zip()), repeat=runs
+                    )
+    return results
+
+
+def measure_template_parse(generator):
+    """Cost of a template cache miss: unzip, parse and wrap the .docx"""
+    path = generator.template_path('benchmark')
+
+    def parse():
+        template_cache.invalidate('benchmark')
+        template_cache.get('benchmark', path)
+
+    return {'generator.template_parse': measure(parse, repeat=3, warmup=0)}
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for document generation, the REST API, the waterfall engine
+and application start-up.
+
+Run from the backend directory:
+  python -m benchmarks.run --output results.json
+  python -m benchmarks.run --quick --baseline baseline.json --threshold 0.25
+
+Results are written as JSON. With --baseline, every metric whose median
+is more than --threshold slower than the stored baseline is reported as a
+regression and the process exits with status 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FULL_MEMBER_COUNTS = (1, 10, 100, 1000, 10000)
+QUICK_MEMBER_COUNTS = (1, 100, 1000)
+SUITES = ('generator', 'api', 'waterfall', 'startup')
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Return (metric, baseline_ms, current_ms, change) for each regression"""
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or previous['median_ms'] <= 0:
+            continue
+        change = current['median_ms'] / previous['median_ms'] - 1
+        if change > threshold:
+            regressions.append((name, previous['median_ms'], current['median_ms'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suite', action='append', choices=SUITES, help='Suite to run (default: all)')
+    parser.add_argument('--quick', action='store_true', help=f'Only {QUICK_MEMBER_COUNTS} members and fewer runs')
+    parser.add_argument('--repeat', type=int, default=None, help='Timed runs per metric')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write results')
+    parser.add_argument('--baseline', help='Results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown before flagging (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    member_counts = QUICK_MEMBER_COUNTS if args.quick else FULL_MEMBER_COUNTS
+    repeat = args.repeat or (3 if args.quick else 7)
+
+    results = {}
+    for suite in args.suite or SUITES:
+        print(f'Running {suite} benchmarks...', file=sys.stderr)
+        if suite == 'generator':
+            from benchmarks import generator_bench
+            results.update(generator_bench.run(member_counts, repeat))
+        elif suite == 'api':
+            from benchmarks import api_bench
+            results.update(api_bench.run(member_counts, repeat))
+        elif suite == 'waterfall':
+            from benchmarks import waterfall_bench
+            results.update(waterfall_bench.run(member_counts, repeat))
+        elif suite == 'startup':
+            from benchmarks import startup_bench
+            results.update(startup_bench.run(member_counts, repeat))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'member_counts': list(member_counts),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    for name, stats in sorted(results.items()):
+        print(f"{name:<60} median {stats['median_ms']:10.2f} ms   p95 {stats['p95_ms']:10.2f} ms")
+    print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f'REGRESSION {name}: {before:.2f} ms -> {after:.2f} ms (+{change:.0%})')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions beyond {args.threshold:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
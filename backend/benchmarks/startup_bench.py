@@ -0,0 +1,65 @@
+"""
+Cold-start timings, each measured in a fresh interpreter.
+
+startup.import_app and startup.create_app are what a worker pays on boot
+without preloading; startup.deferred_imports is the rendering/NumPy import
+cost that is no longer paid there (it moves to the first render, or to the
+gunicorn master with preload_app).
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from .timing import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED_MODULES = ('docx', 'docxtpl', 'lxml.etree', 'numpy')
+
+_APP_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app({'JOB_WORKERS': 0})
+created = time.perf_counter()
+loaded = sorted(m for m in %(deferred)r if m in sys.modules)
+from services.document_generator import preload_rendering
+preload_rendering()
+preloaded = time.perf_counter()
+print(json.dumps({
+    'import_app': imported - start,
+    'create_app': created - imported,
+    'preload_rendering': preloaded - created,
+    'eagerly_loaded': loaded,
+}))
+''' % {'deferred': DEFERRED_MODULES}
+
+_DEFERRED_PROBE = '''
+import importlib, json, time
+start = time.perf_counter()
+for name in %(deferred)r:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+print(json.dumps({'deferred_imports': time.perf_counter() - start}))
+''' % {'deferred': DEFERRED_MODULES}
+
+
+def _probe(source):
+    output = subprocess.check_output([sys.executable, '-c', source], cwd=BACKEND_DIR, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(member_counts, repeat):
+    samples = {}
+    for _ in range(repeat):
+        app_timings = _probe(_APP_PROBE)
+        eagerly_loaded = app_timings.pop('eagerly_loaded')
+        if eagerly_loaded:
+            print(f"warning: importing the app loaded {', '.join(eagerly_loaded)}", file=sys.stderr)
+        for name, seconds in {**app_timings, **_probe(_DEFERRED_PROBE)}.items():
+            samples.setdefault(name, []).append(seconds)
+    return {f'startup.{name}': summarize(values) for name, values in samples.items()}
@@ -0,0 +1,102 @@
+import random
+from datetime import date
+
+from docx import Document
+
+from services.snapshot import agreement_from_dict
+
+_CLASSES = ('A', 'B', 'C')
+
+
+def synthetic_snapshot(member_count, large_data=False, seed=0, agreement_id=1):
+    """An agreement snapshot (see services.snapshot) with member_count members"""
+    rng = random.Random(seed)
+    data = {
+        'purpose': 'acquire, hold and dispose of investments in operating businesses',
+        'class_a_valuation': '£0.95m',
+        'class_b_valuation': '£3.25m',
+    }
+    if large_data:
+        # Roughly 200 KB of clause text and schedules stored in the data column
+        data['clauses'] = {f'clause_{i}': ' '.join(rng.choice(_WORDS) for _ in range(120)) for i in range(250)}
+        data['schedules'] = [{'row': i, 'value': rng.random()} for i in range(2000)]
+
+    members = []
+    for i in range(member_count):
+        member_class = _CLASSES[i % 3]
+        commitment = 0 if member_class == 'C' else rng.randint(10, 5000) * 1000
+        members.append({
+            'id': i + 1,
+            'name': f'Member {i + 1}',
+            'entity_name': f'Member {i + 1} Holdings Ltd' if i % 4 == 0 else None,
+            'member_class': member_class,
+            'units': rng.randint(1, 1000),
+            'capital_commitment': commitment,
+            'percentage_interest': round(100.0 / max(member_count, 1), 4),
+            'is_manager': False,
+            'address': None,
+            'email': f'member{i + 1}@example.com',
+        })
+
+    return {
+        'id': agreement_id,
+        'company_name': f'Benchmark Holdings {agreement_id} LLC',
+        'state': 'Delaware',
+        'formation_date': date(2024, 1, 15).isoformat(),
+        'effective_date': date(2024, 2, 1).isoformat(),
+        'manager_name': 'Benchmark Manager LLC',
+        'manager_entity': 'Benchmark Manager Group',
+        'principal_place_of_business': '1 Example Street, London',
+        'registered_agent': 'Registered Agents Inc.',
+        'purpose': data['purpose'],
+        'data': data,
+        'members': members,
+    }
+
+
+def synthetic_agreement(member_count, large_data=False, seed=0):
+    """Attribute-style agreement the document generator accepts"""
+    return agreement_from_dict(synthetic_snapshot(member_count, large_data, seed))
+
+
+def api_payload(snapshot):
+    """The same agreement in the shape POST /api/agreements expects"""
+    payload = {k: v for k, v in snapshot.items() if k not in ('id', 'members', 'data')}
+    payload.update(snapshot['data'])
+    payload['members'] = [{
+        'name': m['name'],
+        'entity_name': m['entity_name'],
+        'class': m['member_class'],
+        'units': m['units'],
+        'capital_commitment': m['capital_commitment'],
+        'percentage_interest': m['percentage_interest'],
+    } for m in snapshot['members']]
+    return payload
+
+
+def write_benchmark_template(path):
+    """A small docxtpl template using the same context keys as prepare_context"""
+    doc = Document()
+    doc.add_heading('LIMITED LIABILITY COMPANY AGREEMENT OF {{ company_name }}', level=1)
+    doc.add_paragraph('(a {{ state }} limited liability company) formed on {{ formation_date }}, '
+                      'effective {{ effective_date }}.')
+    doc.add_paragraph('Manager: {{ manager_name }} {{ manager_entity }}')
+    doc.add_paragraph('Purpose: {{ purpose }}')
+
+    table = doc.add_table(rows=4, cols=4)
+    table.style = 'Table Grid'
+    for i, header in enumerate(['Member', 'Class', 'Commitment', 'Interest']):
+        table.rows[0].cells[i].text = header
+    table.rows[1].cells[0].text = '{%tr for m in members_table %}'
+    for i, field in enumerate(['name', 'class', 'commitment', 'percentage']):
+        table.rows[2].cells[i].text = '{{ m.%s }}' % field
+    table.rows[3].cells[0].text = '{%tr endfor %}'
+
+    doc.add_paragraph('Registered agent: {{ registered_agent }}. Principal place: {{ principal_place }}.')
+    doc.save(path)
+
+
+_WORDS = (
+    'member', 'manager', 'capital', 'distribution', 'agreement', 'company', 'interest', 'consent',
+    'transfer', 'units', 'reserved', 'matters', 'board', 'vesting', 'schedule', 'contribution'
+)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark for the from-scratch member tables.
+
+Builds the Article III members table and the signature table for 10 to
+10,000 members and checks that time per member stays flat, i.e. that
+table emission scales linearly.
+
+Run from the backend directory:
+  python -m benchmarks.table_scaling
+  python -m benchmarks.table_scaling --legacy   # also time the old cell-by-cell fill
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from services.docx_tables import add_table
+
+SIZES = (10, 100, 1000, 10000)
+# Per-member time at the largest size may be at most this multiple of the smallest measured
+MAX_PER_MEMBER_GROWTH = 3.0
+
+
+def member_rows(count):
+    return [
+        [f'Member {i}', 'ABC'[i % 3], f'£{(i + 1) * 1000:,.0f}', 'Pro-rata calls']
+        for i in range(count)
+    ]
+
+
+def build_fast(rows):
+    doc = Document()
+    add_table(doc, ['Member', 'Class', 'Commitment', 'Payment Terms'], rows, 'Light List Accent 1')
+    add_table(doc, ['Member / Manager', 'Capacity', 'Signature / Date'],
+              [[r[0], f'Member (Class {r[1]})', '_' * 30] for r in rows], 'Table Grid')
+    return doc
+
+
+def build_legacy(rows):
+    """The previous implementation, kept here for comparison"""
+    doc = Document()
+    table = doc.add_table(rows=len(rows) + 1, cols=4)
+    table.style = 'Light List Accent 1'
+    for i, header in enumerate(['Member', 'Class', 'Commitment', 'Payment Terms']):
+        cell = table.rows[0].cells[i]
+        cell.text = header
+        cell.paragraphs[0].runs[0].bold = True
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            table.rows[i + 1].cells[j].text = value
+    return doc
+
+
+def time_build(build, count, repeat=3):
+    rows = member_rows(count)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--legacy', action='store_true', help='Also time the cell-by-cell implementation (up to 1,000 members)')
+    args = parser.parse_args()
+
+    results = []
+    for count in SIZES:
+        seconds = time_build(build_fast, count)
+        results.append((count, seconds))
+        line = f'{count:>6} members: {seconds * 1000:9.1f} ms  ({seconds / count * 1e6:7.1f} µs/member)'
+        if args.legacy and count <= 1000:
+            legacy = time_build(build_legacy, count, repeat=1)
+            line += f'   legacy {legacy * 1000:9.1f} ms'
+        print(line)
+
+    # Ignore the smallest size, where fixed per-document cost dominates
+    per_member = [seconds / count for count, seconds in results[1:]]
+    growth = per_member[-1] / per_member[0]
+    print(f'Per-member time growth {SIZES[1]} -> {SIZES[-1]}: {growth:.2f}x (limit {MAX_PER_MEMBER_GROWTH}x)')
+    if growth > MAX_PER_MEMBER_GROWTH:
+        print('FAIL: table emission is no longer linear')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import statistics
+import time
+
+
+def summarize(samples):
+    """Millisecond statistics for a list of durations in seconds"""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'runs': len(ordered),
+        'min_ms': ordered[0] * 1000,
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': ordered[p95_index] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def measure(fn, repeat=5, warmup=1):
+    """Time fn() repeat times after warmup untimed calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+class PhaseTimer:
+    """Collect durations for named phases across repeated runs"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def time(self, phase, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.setdefault(phase, []).append(time.perf_counter() - start)
+        return result
+
+    def results(self, prefix):
+        return {f'{prefix}.{phase}': summarize(samples) for phase, samples in self.samples.items()}
@@ -0,0 +1,33 @@
+import numpy as np
+
+from services.waterfall import run_waterfall
+
+from .timing import PhaseTimer
+
+# exit values x holding periods
+SCENARIO_GRIDS = {'1k': (100, 10), '100k': (10000, 10)}
+
+
+def bench_waterfall(member_count, exit_count, year_count, repeat):
+    """Tier computation and the chunked per-member summary, timed separately"""
+    rng = np.random.default_rng(0)
+    capital = rng.uniform(10_000, 1_000_000, member_count)
+    units = capital / 100
+    exit_values = np.linspace(0, capital.sum() * 5, exit_count)
+    years = np.arange(1, year_count + 1)
+
+    timer = PhaseTimer()
+    for _ in range(repeat):
+        result = timer.time('tiers', run_waterfall, capital, units, exit_values, years,
+                            carry=0.2, preferred_return=0.08)
+        timer.time('member_summary', result.member_summary)
+    return timer
+
+
+def run(member_counts, repeat):
+    results = {}
+    for count in member_counts:
+        for grid_label, (exit_count, year_count) in SCENARIO_GRIDS.items():
+            timer = bench_waterfall(count, exit_count, year_count, repeat)
+            results.update(timer.results(f'waterfall.{grid_label}.{count}m'))
+    return results
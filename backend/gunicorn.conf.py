@@ -0,0 +1,40 @@
+"""
+Gunicorn settings, used as: gunicorn -c gunicorn.conf.py "app:create_app()"
+
+With preload_app (GUNICORN_PRELOAD, on by default) the master imports the
+app, the rendering libraries and every template once before forking.
+Workers then start without re-importing anything and share those pages
+copy-on-write; gc.freeze() keeps the collector from touching (and so
+copying) them in each worker.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers fork
+    if not preload_app:
+        return
+
+    from services.document_generator import preload_rendering
+    from services.template_registry import template_registry
+
+    preload_rendering()
+    warmed = template_registry.warm()
+    server.log.info('Preloaded rendering libraries and %d templates: %s', len(warmed), ', '.join(warmed))
+
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Threads don't survive fork, so job workers are started in each worker process.
+    # The master never opens a database connection, so there is no pool to reset here.
+    from services.jobs import job_queue
+    job_queue.start()
@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import JSON
@@ -20,10 +21,24 @@ class Agreement(db.Model):
     data = db.Column(JSON)  # Store complete agreement data as JSON
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)  # Optimistic-concurrency token
     
     # Relationships
     members = db.relationship('Member', back_populates='agreement', cascade='all, delete-orphan')
     capital_structure = db.relationship('CapitalStructure', back_populates='agreement', uselist=False, cascade='all, delete-orphan')
+    
+    # Listing is keyset-paginated on (updated_at, id), optionally filtered by state or manager
+    __table_args__ = (
+        db.Index('ix_agreements_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_agreements_state_updated_at_id', 'state', 'updated_at', 'id'),
+        db.Index('ix_agreements_manager_updated_at_id', 'manager_name', 'updated_at', 'id'),
+        db.Index('ix_agreements_created_at', 'created_at'),
+        db.Index('ix_agreements_formation_date', 'formation_date'),
+        db.Index('ix_agreements_effective_date', 'effective_date'),
+    )
+    
+    # Every UPDATE is guarded by, and increments, the version column
+    __mapper_args__ = {'version_id_col': version}
 
 class Member(db.Model):
     __tablename__ = 'members'
@@ -32,10 +47,11 @@ class Member(db.Model):
     agreement_id = db.Column(db.Integer, db.ForeignKey('agreements.id'), nullable=False)
     name = db.Column(db.String(200), nullable=False)
     entity_name = db.Column(db.String(200))  # If member is an entity
-    member_class = db.Column(db.String(50))  # A, B, C, etc.
-    units = db.Column(db.Float, default=0)
-    capital_commitment = db.Column(db.Float, default=0)
-    percentage_interest = db.Column(db.Float, default=0)
+    # active_history keeps the previous value on change so the cap table can apply deltas
+    member_class = db.column_property(db.Column(db.String(50)), active_history=True)  # A, B, C, etc.
+    units = db.column_property(db.Column(db.Float, default=0), active_history=True)
+    capital_commitment = db.column_property(db.Column(db.Float, default=0), active_history=True)
+    percentage_interest = db.column_property(db.Column(db.Float, default=0), active_history=True)
     is_manager = db.Column(db.Boolean, default=False)
     address = db.Column(db.Text)
     email = db.Column(db.String(200))
@@ -56,6 +72,12 @@ class CapitalCommitment(db.Model):
     
     # Relationships
     member = db.relationship('Member', back_populates='capital_commitments')
+    
+    # Capital-call reports filter by member and due date, then split on paid
+    __table_args__ = (
+        db.Index('ix_capital_commitments_member_due_paid', 'member_id', 'due_date', 'paid'),
+        db.Index('ix_capital_commitments_due_paid', 'due_date', 'paid'),
+    )
 
 class CapitalStructure(db.Model):
     __tablename__ = 'capital_structure'
@@ -82,4 +104,59 @@ class CapitalStructure(db.Model):
     preferred_return = db.Column(db.Float, default=0)
     
     # Relationships
-    agreement = db.relationship('Agreement', back_populates='capital_structure')
\ No newline at end of file
+    agreement = db.relationship('Agreement', back_populates='capital_structure')
+
+class CapTableEntry(db.Model):
+    """Per-class member totals for an agreement, kept current by services/cap_table.py"""
+    __tablename__ = 'cap_table_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    agreement_id = db.Column(db.Integer, db.ForeignKey('agreements.id'), nullable=False)
+    member_class = db.Column(db.String(50), nullable=False, default='')  # '' for members without a class
+    member_count = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Float, nullable=False, default=0)
+    capital_commitment = db.Column(db.Float, nullable=False, default=0)
+    percentage_interest = db.Column(db.Float, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('agreement_id', 'member_class', name='uq_cap_table_entries_agreement_class'),
+    )
+
+class AgreementRevision(db.Model):
+    """One saved version of an agreement: a full checkpoint or a delta against the previous revision"""
+    __tablename__ = 'agreement_revisions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    agreement_id = db.Column(db.Integer, db.ForeignKey('agreements.id'), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)  # Agreement.version after the change
+    kind = db.Column(db.String(20), nullable=False)  # checkpoint, delta
+    payload = db.deferred(db.Column(JSON, nullable=False))  # Only loaded when reconstructing
+    size = db.Column(db.Integer, nullable=False)  # Serialised payload bytes
+    changed = db.Column(JSON)  # Top-level paths the change touched
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('agreement_id', 'revision', name='uq_agreement_revisions_agreement_revision'),
+        db.Index('ix_agreement_revisions_agreement_kind_revision', 'agreement_id', 'kind', 'revision'),
+    )
+
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    agreement_id = db.Column(db.Integer, db.ForeignKey('agreements.id'), nullable=False, index=True)
+    template = db.Column(db.String(200), default='default')
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    error = db.Column(db.Text)
+    result = db.deferred(db.Column(db.LargeBinary))  # Rendered .docx, only loaded for downloads
+    result_size = db.Column(db.Integer)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_generation_jobs_status_run_after', 'status', 'run_after'),
+    )
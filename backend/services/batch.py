@@ -0,0 +1,115 @@
+import io
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from .document_generator import DocumentGenerator
+from .snapshot import agreement_from_dict
+from .streaming import iter_documents_zip
+from .template_cache import template_cache
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _available_templates():
+    templates_dir = DocumentGenerator().templates_dir
+    return [f[:-len('.docx')] for f in os.listdir(templates_dir) if f.endswith('.docx')]
+
+
+def _init_worker(template_names):
+    """Parse every known template once so each worker starts warm"""
+    generator = DocumentGenerator()
+    for name in template_names:
+        path = generator.template_path(name)
+        if os.path.exists(path):
+            template_cache.get(name, path)
+
+
+def render_snapshot(snapshot, template_name):
+    """Worker entry point: render one agreement snapshot to .docx bytes"""
+    agreement = agreement_from_dict(snapshot)
+    buffer = io.BytesIO()
+    DocumentGenerator().generate(agreement, template_name, output=buffer)
+    return buffer.getvalue()
+
+
+def _mp_context():
+    # The pool is created lazily inside a threaded web worker, where a plain
+    # fork could copy locks held by other threads (the job workers, the DB
+    # pool) into the children; start workers from a clean process instead
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=int(os.getenv('BATCH_WORKERS', str(os.cpu_count() or 2))),
+                mp_context=_mp_context(),
+                initializer=_init_worker,
+                initargs=(_available_templates(),)
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def safe_filename(text, fallback):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', text or '').strip('_') or fallback
+
+
+def archive_name(snapshot):
+    return f"{snapshot['id']}_{safe_filename(snapshot['company_name'], 'agreement')}.docx"
+
+
+def iter_batch_zip(snapshots, template_name, missing_ids=()):
+    """Render snapshots across the process pool and yield a ZIP archive as documents finish"""
+    manifest = {
+        'template': template_name,
+        'generated_at': datetime.utcnow().isoformat(),
+        'documents': [{'agreement_id': i, 'status': 'not_found'} for i in missing_ids]
+    }
+
+    try:
+        pool = get_pool()
+        futures = {pool.submit(render_snapshot, snapshot, template_name): snapshot for snapshot in snapshots}
+    except BrokenProcessPool:
+        _reset_pool()
+        pool = get_pool()
+        futures = {pool.submit(render_snapshot, snapshot, template_name): snapshot for snapshot in snapshots}
+
+    def results():
+        for future in as_completed(futures):
+            snapshot = futures[future]
+            entry = {'agreement_id': snapshot['id'], 'company_name': snapshot['company_name']}
+            content = None
+            try:
+                content = future.result()
+            except BrokenProcessPool:
+                _reset_pool()
+                entry.update(status='error', error='worker process died')
+            except Exception as exc:
+                entry.update(status='error', error=f'{type(exc).__name__}: {exc}')
+            else:
+                entry.update(status='ok', filename=archive_name(snapshot), size=len(content))
+            yield entry, content
+
+    try:
+        yield from iter_documents_zip(results(), manifest)
+    finally:
+        # Client went away or something failed: don't keep rendering for nobody
+        for future in futures:
+            future.cancel()
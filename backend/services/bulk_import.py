@@ -0,0 +1,163 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Agreement, Member
+
+from .cap_table import record_bulk_members
+from .revisions import record_bulk_checkpoints, state_from_values
+from .search import index_bulk
+
+DEFAULT_CHUNK_SIZE = 500
+
+REQUIRED_FIELDS = ('company_name', 'formation_date', 'effective_date', 'manager_name')
+
+
+def agreement_values(data):
+    """Column values for an Agreement, mapped the same way as POST /api/agreements"""
+    return {
+        'company_name': data['company_name'],
+        'state': data.get('state', 'Delaware'),
+        'formation_date': datetime.fromisoformat(data['formation_date']),
+        'effective_date': datetime.fromisoformat(data['effective_date']),
+        'manager_name': data['manager_name'],
+        'manager_entity': data.get('manager_entity'),
+        'principal_place_of_business': data.get('principal_place_of_business'),
+        'registered_agent': data.get('registered_agent'),
+        'purpose': data.get('purpose'),
+        'data': data
+    }
+
+
+def member_values(member_data):
+    return {
+        'name': member_data['name'],
+        'entity_name': member_data.get('entity_name'),
+        'member_class': member_data['class'],
+        'units': member_data.get('units', 0),
+        'capital_commitment': member_data.get('capital_commitment', 0),
+        'percentage_interest': member_data.get('percentage_interest', 0)
+    }
+
+
+def validate_record(record):
+    """Return (agreement values, member values, errors) for one import record"""
+    if not isinstance(record, dict):
+        return None, None, ['Record must be a JSON object']
+
+    errors = [f'Missing required field: {field}' for field in REQUIRED_FIELDS if not record.get(field)]
+    for field in ('formation_date', 'effective_date'):
+        if record.get(field):
+            try:
+                datetime.fromisoformat(record[field])
+            except (TypeError, ValueError):
+                errors.append(f'Invalid date for {field}: {record[field]!r}')
+
+    members = record.get('members', [])
+    if not isinstance(members, list):
+        errors.append('members must be a list')
+        members = []
+    for i, member in enumerate(members):
+        if not isinstance(member, dict):
+            errors.append(f'members[{i}] must be an object')
+            continue
+        for field in ('name', 'class'):
+            if not member.get(field):
+                errors.append(f'members[{i}] missing required field: {field}')
+        for field in ('units', 'capital_commitment', 'percentage_interest'):
+            value = member.get(field, 0)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                errors.append(f'members[{i}].{field} must be a number')
+
+    if errors:
+        return None, None, errors
+    return agreement_values(record), [member_values(m) for m in members], []
+
+
+def _insert_chunk(records):
+    """Insert agreements, members, cap tables, search rows and first revisions, one executemany each"""
+    now = datetime.utcnow()
+    rows = [dict(values, created_at=now, updated_at=now) for _, values, _ in records]
+    ids = db.session.execute(
+        insert(Agreement).returning(Agreement.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+
+    member_rows = [
+        dict(member, agreement_id=agreement_id)
+        for agreement_id, (_, _, members) in zip(ids, records)
+        for member in members
+    ]
+    if member_rows:
+        member_ids = db.session.execute(
+            insert(Member).returning(Member.id, sort_by_parameter_order=True),
+            member_rows
+        ).scalars().all()
+        for row, member_id in zip(member_rows, member_ids):
+            row['id'] = member_id
+        # Core inserts skip the ORM events that maintain the cap table
+        record_bulk_members(member_rows)
+
+    members_by_agreement = {}
+    for row in member_rows:
+        members_by_agreement.setdefault(row['agreement_id'], []).append(row)
+    index_bulk([
+        (agreement_id, values, members_by_agreement.get(agreement_id, []))
+        for agreement_id, (_, values, _) in zip(ids, records)
+    ])
+    record_bulk_checkpoints([
+        (agreement_id, state_from_values(values, members_by_agreement.get(agreement_id, [])))
+        for agreement_id, (_, values, _) in zip(ids, records)
+    ])
+    return ids
+
+
+def _flush(records):
+    try:
+        ids = _insert_chunk(records)
+        db.session.commit()
+    except SQLAlchemyError as exc:
+        db.session.rollback()
+        if len(records) == 1:
+            yield {'line': records[0][0], 'status': 'error', 'errors': [str(getattr(exc, 'orig', None) or exc)]}
+            return
+        # Isolate the offending rows by retrying one record at a time
+        for record in records:
+            yield from _flush([record])
+        return
+
+    for (line_no, _, _), agreement_id in zip(records, ids):
+        yield {'line': line_no, 'status': 'created', 'id': agreement_id}
+
+
+def import_ndjson(lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import NDJSON agreement records, yielding one report entry per non-blank line.
+
+    ``lines`` can be any iterable of str or bytes lines (a file, a request
+    stream), so only one chunk of records is held in memory at a time.
+    """
+    pending = []
+    for line_no, raw in enumerate(lines, 1):
+        if not raw.strip():
+            continue
+
+        try:
+            record = json.loads(raw)
+        except ValueError as exc:
+            yield {'line': line_no, 'status': 'error', 'errors': [f'Invalid JSON: {exc}']}
+            continue
+
+        values, members, errors = validate_record(record)
+        if errors:
+            yield {'line': line_no, 'status': 'error', 'errors': errors}
+            continue
+
+        pending.append((line_no, values, members))
+        if len(pending) >= chunk_size:
+            yield from _flush(pending)
+            pending = []
+
+    if pending:
+        yield from _flush(pending)
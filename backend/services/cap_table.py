@@ -0,0 +1,214 @@
+"""
+Materialised cap table: one row per (agreement, member class) holding the
+member count and the summed units, capital commitments and stated
+percentage interests.
+
+Rows are adjusted by deltas inside the same flush that inserts, updates or
+deletes a Member, so reading an agreement's cap table never touches the
+members table. Core bulk inserts bypass ORM events and call
+``record_bulk_members`` instead. ``check_cap_tables`` recomputes everything
+from the members table and can repair any drift.
+"""
+
+import math
+
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from models import db, CapTableEntry, Member
+
+TOTAL_FIELDS = ('member_count', 'units', 'capital_commitment', 'percentage_interest')
+SUMMED_FIELDS = TOTAL_FIELDS[1:]
+
+
+def _class_key(member_class):
+    return member_class or ''
+
+
+def _dialect_insert(dialect_name):
+    """INSERT ... ON CONFLICT for dialects that have it, else None"""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def apply_delta(connection, agreement_id, member_class, delta):
+    """Add ``delta`` (member_count, units, capital_commitment, percentage_interest) to one row"""
+    table = CapTableEntry.__table__
+    values = dict(zip(TOTAL_FIELDS, delta), agreement_id=agreement_id, member_class=member_class)
+    row = (table.c.agreement_id == agreement_id) & (table.c.member_class == member_class)
+
+    dialect_insert = _dialect_insert(connection.dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.agreement_id, table.c.member_class],
+            set_={name: table.c[name] + stmt.excluded[name] for name in TOTAL_FIELDS}
+        )
+        connection.execute(stmt)
+    else:
+        result = connection.execute(
+            update(table).where(row).values({name: table.c[name] + values[name] for name in TOTAL_FIELDS})
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**values))
+
+    # A class with no members left disappears from the cap table
+    if delta[0] < 0:
+        connection.execute(delete(table).where(row, table.c.member_count <= 0))
+
+
+def _member_totals(member, previous=False):
+    """(agreement_id, class, delta) for a member as it is now, or as it was before this flush"""
+    state = inspect(member)
+
+    def value(attr):
+        history = state.attrs[attr].history
+        if previous and history.deleted:
+            return history.deleted[0]
+        return getattr(member, attr)
+
+    delta = (1,) + tuple(value(field) or 0 for field in SUMMED_FIELDS)
+    return value('agreement_id'), _class_key(value('member_class')), delta
+
+
+def _negate(delta):
+    return tuple(-v for v in delta)
+
+
+@event.listens_for(Member, 'after_insert')
+def _member_inserted(mapper, connection, member):
+    agreement_id, member_class, delta = _member_totals(member)
+    apply_delta(connection, agreement_id, member_class, delta)
+
+
+@event.listens_for(Member, 'after_update')
+def _member_updated(mapper, connection, member):
+    old_agreement, old_class, old_delta = _member_totals(member, previous=True)
+    new_agreement, new_class, new_delta = _member_totals(member)
+    if (old_agreement, old_class) == (new_agreement, new_class):
+        if old_delta != new_delta:
+            change = (0,) + tuple(new - old for new, old in zip(new_delta[1:], old_delta[1:]))
+            apply_delta(connection, new_agreement, new_class, change)
+        return
+    apply_delta(connection, old_agreement, old_class, _negate(old_delta))
+    apply_delta(connection, new_agreement, new_class, new_delta)
+
+
+@event.listens_for(Member, 'after_delete')
+def _member_deleted(mapper, connection, member):
+    agreement_id, member_class, delta = _member_totals(member)
+    apply_delta(connection, agreement_id, member_class, _negate(delta))
+
+
+@event.listens_for(Session, 'before_flush')
+def _load_deleted_members(session, flush_context, instances):
+    # after_delete runs once the row is gone, so expired members must be loaded first
+    for obj in session.deleted:
+        if isinstance(obj, Member):
+            for field in ('agreement_id', 'member_class') + SUMMED_FIELDS:
+                getattr(obj, field)
+
+
+def record_bulk_members(member_rows):
+    """Insert cap-table rows for members of agreements created in the same statement batch.
+
+    Only valid for brand-new agreements, which have no cap-table rows yet.
+    """
+    totals = {}
+    for member in member_rows:
+        key = (member['agreement_id'], _class_key(member.get('member_class')))
+        current = totals.get(key, (0, 0.0, 0.0, 0.0))
+        totals[key] = (current[0] + 1,) + tuple(
+            total + (member.get(field) or 0) for total, field in zip(current[1:], SUMMED_FIELDS)
+        )
+    if totals:
+        db.session.execute(insert(CapTableEntry), [
+            dict(zip(TOTAL_FIELDS, delta), agreement_id=agreement_id, member_class=member_class)
+            for (agreement_id, member_class), delta in totals.items()
+        ])
+
+
+def cap_table_to_dict(agreement_id, entries):
+    totals = {name: sum(getattr(e, name) for e in entries) for name in TOTAL_FIELDS}
+
+    def share(value, total):
+        return value / total if total else None
+
+    return {
+        'agreement_id': agreement_id,
+        'totals': totals,
+        'classes': [{
+            'class': entry.member_class or None,
+            'member_count': entry.member_count,
+            'units': entry.units,
+            'capital_commitment': entry.capital_commitment,
+            'percentage_interest': entry.percentage_interest,
+            'fully_diluted_ownership': share(entry.units, totals['units']),
+            'commitment_share': share(entry.capital_commitment, totals['capital_commitment'])
+        } for entry in entries]
+    }
+
+
+def get_cap_table(agreement_id):
+    """The stored per-class rows for an agreement, ordered by class"""
+    return CapTableEntry.query.filter_by(agreement_id=agreement_id).order_by(CapTableEntry.member_class).all()
+
+
+def _expected_totals(agreement_ids=None):
+    member_class = func.coalesce(Member.member_class, '')
+    query = select(
+        Member.agreement_id, member_class, func.count(Member.id),
+        *(func.coalesce(func.sum(getattr(Member, field)), 0) for field in SUMMED_FIELDS)
+    ).group_by(Member.agreement_id, member_class)
+    if agreement_ids is not None:
+        query = query.where(Member.agreement_id.in_(agreement_ids))
+    return {(row[0], row[1]): tuple(row[2:]) for row in db.session.execute(query)}
+
+
+def _stored_totals(agreement_ids=None):
+    query = select(CapTableEntry.agreement_id, CapTableEntry.member_class,
+                   *(getattr(CapTableEntry, field) for field in TOTAL_FIELDS))
+    if agreement_ids is not None:
+        query = query.where(CapTableEntry.agreement_id.in_(agreement_ids))
+    return {(row[0], row[1]): tuple(row[2:]) for row in db.session.execute(query)}
+
+
+def _matches(expected, stored):
+    if expected is None or stored is None:
+        return expected is stored
+    return expected[0] == stored[0] and all(
+        math.isclose(e, s, rel_tol=1e-9, abs_tol=1e-6) for e, s in zip(expected[1:], stored[1:])
+    )
+
+
+def check_cap_tables(agreement_ids=None, repair=False):
+    """Recompute cap tables from members and report (or, with repair, fix) mismatched rows"""
+    expected = _expected_totals(agreement_ids)
+    stored = _stored_totals(agreement_ids)
+
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys()):
+        if not _matches(expected.get(key), stored.get(key)):
+            mismatches.append({
+                'agreement_id': key[0],
+                'class': key[1] or None,
+                'expected': dict(zip(TOTAL_FIELDS, expected[key])) if key in expected else None,
+                'stored': dict(zip(TOTAL_FIELDS, stored[key])) if key in stored else None
+            })
+
+    if repair and mismatches:
+        broken = {m['agreement_id'] for m in mismatches}
+        db.session.execute(delete(CapTableEntry).where(CapTableEntry.agreement_id.in_(broken)))
+        rows = [
+            dict(zip(TOTAL_FIELDS, totals), agreement_id=agreement_id, member_class=member_class)
+            for (agreement_id, member_class), totals in expected.items() if agreement_id in broken
+        ]
+        if rows:
+            db.session.execute(insert(CapTableEntry), rows)
+        db.session.commit()
+    return mismatches
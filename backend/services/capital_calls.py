@@ -0,0 +1,160 @@
+"""
+Capital-call reporting over CapitalCommitment.
+
+Grouping and summing happen in SQL. Detail exports run on a server-side
+cursor (yield_per implies stream_results), so memory stays flat however
+many commitments match.
+"""
+
+from datetime import date
+
+from sqlalchemy import and_, case, func, select
+
+from models import db, Agreement, CapitalCommitment, Member
+
+GROUPINGS = ('agreement', 'member', 'class', 'month')
+STATUSES = ('all', 'outstanding', 'overdue', 'paid')
+EXPORT_BATCH_SIZE = 1000
+
+DETAIL_COLUMNS = (
+    'commitment_id', 'agreement_id', 'company_name', 'member_id', 'member_name', 'member_class',
+    'amount', 'due_date', 'paid', 'paid_date', 'days_overdue'
+)
+
+
+class ReportError(ValueError):
+    pass
+
+
+def _parse_date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError as exc:
+        raise ReportError(f'{name} must be an ISO date (YYYY-MM-DD)') from exc
+
+
+def report_filters(args):
+    """Filters shared by the summary and export reports, from request arguments"""
+    agreement_id = args.get('agreement_id')
+    if agreement_id is not None and not agreement_id.isdigit():
+        raise ReportError('agreement_id must be an integer')
+    return {
+        'as_of': _parse_date(args, 'as_of') or date.today(),
+        'agreement_id': int(agreement_id) if agreement_id else None,
+        'state': args.get('state'),
+        'member_class': args.get('class'),
+        'due_from': _parse_date(args, 'due_from'),
+        'due_to': _parse_date(args, 'due_to'),
+    }
+
+
+def _unpaid():
+    # paid defaults to False but older rows may hold NULL
+    return CapitalCommitment.paid.is_not(True)
+
+
+def _overdue(as_of):
+    return and_(_unpaid(), CapitalCommitment.due_date < as_of)
+
+
+def _joined(stmt):
+    return stmt.select_from(CapitalCommitment).join(Member).join(Agreement)
+
+
+def _apply_filters(stmt, filters):
+    if filters['agreement_id'] is not None:
+        stmt = stmt.where(Member.agreement_id == filters['agreement_id'])
+    if filters['state']:
+        stmt = stmt.where(Agreement.state == filters['state'])
+    if filters['member_class']:
+        stmt = stmt.where(Member.member_class == filters['member_class'])
+    if filters['due_from']:
+        stmt = stmt.where(CapitalCommitment.due_date >= filters['due_from'])
+    if filters['due_to']:
+        stmt = stmt.where(CapitalCommitment.due_date <= filters['due_to'])
+    return stmt
+
+
+def _month(column):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+
+def _group_columns(group_by):
+    if group_by == 'agreement':
+        return [Agreement.id.label('agreement_id'), Agreement.company_name]
+    if group_by == 'member':
+        return [Agreement.id.label('agreement_id'), Member.id.label('member_id'),
+                Member.name.label('member_name'), Member.member_class]
+    if group_by == 'class':
+        return [Member.member_class]
+    if group_by == 'month':
+        return [_month(CapitalCommitment.due_date).label('due_month')]
+    raise ReportError(f'group_by must be one of: {", ".join(GROUPINGS)}')
+
+
+def _aggregates(as_of):
+    amount = CapitalCommitment.amount
+    overdue = _overdue(as_of)
+    return [
+        func.count(CapitalCommitment.id).label('calls'),
+        func.coalesce(func.sum(amount), 0).label('committed'),
+        func.coalesce(func.sum(case((CapitalCommitment.paid.is_(True), amount), else_=0)), 0).label('paid'),
+        func.coalesce(func.sum(case((_unpaid(), amount), else_=0)), 0).label('outstanding'),
+        func.coalesce(func.sum(case((overdue, amount), else_=0)), 0).label('overdue'),
+        func.coalesce(func.sum(case((overdue, 1), else_=0)), 0).label('overdue_calls'),
+        func.min(case((overdue, CapitalCommitment.due_date))).label('oldest_overdue_date'),
+        func.min(case((and_(_unpaid(), CapitalCommitment.due_date >= as_of), CapitalCommitment.due_date)))
+            .label('next_due_date'),
+    ]
+
+
+def summary_query(group_by, filters):
+    """One aggregated row per group, ordered by the group columns"""
+    group_columns = _group_columns(group_by)
+    stmt = _joined(select(*group_columns, *_aggregates(filters['as_of'])))
+    stmt = _apply_filters(stmt, filters)
+    return stmt.group_by(*group_columns).order_by(*group_columns)
+
+
+def totals_query(filters):
+    return _apply_filters(_joined(select(*_aggregates(filters['as_of']))), filters)
+
+
+def detail_query(status, filters):
+    if status not in STATUSES:
+        raise ReportError(f'status must be one of: {", ".join(STATUSES)}')
+    stmt = _joined(select(
+        CapitalCommitment.id, Agreement.id, Agreement.company_name, Member.id, Member.name,
+        Member.member_class, CapitalCommitment.amount, CapitalCommitment.due_date,
+        CapitalCommitment.paid, CapitalCommitment.paid_date
+    ))
+    stmt = _apply_filters(stmt, filters)
+    if status == 'outstanding':
+        stmt = stmt.where(_unpaid())
+    elif status == 'overdue':
+        stmt = stmt.where(_overdue(filters['as_of']))
+    elif status == 'paid':
+        stmt = stmt.where(CapitalCommitment.paid.is_(True))
+    return stmt.order_by(CapitalCommitment.due_date, CapitalCommitment.id)
+
+
+def stream_rows(stmt, batch_size=EXPORT_BATCH_SIZE):
+    """Iterate result rows from a server-side cursor, batch_size rows at a time"""
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+
+def iter_detail_rows(stmt, as_of, batch_size=EXPORT_BATCH_SIZE):
+    """Detail rows (as DETAIL_COLUMNS) with days_overdue as of the report date"""
+    for row in stream_rows(stmt, batch_size):
+        due_date, paid = row[7], row[8]
+        days_overdue = (as_of - due_date).days if not paid and due_date < as_of else 0
+        yield (*row, days_overdue)
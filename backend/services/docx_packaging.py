@@ -0,0 +1,186 @@
+"""
+Writing .docx packages without recompressing unchanged parts.
+
+python-docx deflates every part of the package on every save, although a
+render normally only changes ``word/document.xml`` (and perhaps its rels).
+``TemplatePackage`` records, for each member of a template archive, a digest
+of the part as python-docx serializes it straight after loading, together
+with the member's compressed bytes. ``save`` then copies those bytes as they
+are for every part whose serialization still matches, and compresses only
+the parts that changed.
+"""
+
+import hashlib
+import struct
+import time
+import zipfile
+import zlib
+
+DEFAULT_COMPRESSION_LEVEL = 6
+
+_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_CENTRAL_HEADER = struct.Struct('<4s6H3L5H2L')
+_END_OF_CENTRAL_DIRECTORY = struct.Struct('<4s4H2LH')
+_ZIP32_LIMIT = 0xFFFFFFFF
+_UTF8_FLAG = 0x800
+_VERSION = 20
+
+
+class PackagingError(ValueError):
+    pass
+
+
+def _digest(blob):
+    return hashlib.blake2b(blob, digest_size=16).digest()
+
+
+def _package_items(document):
+    """(membername, blob) for every member python-docx would write, in its order"""
+    from docx.opc.pkgwriter import PackageWriter
+
+    class _Collector:
+        def __init__(self):
+            self.items = []
+
+        def write(self, pack_uri, blob):
+            self.items.append((pack_uri.membername, blob))
+
+    package = document.part.package
+    collector = _Collector()
+    # The same steps as PackageWriter.write, with our writer in place of its zip file
+    PackageWriter._write_content_types_stream(collector, package.parts)
+    PackageWriter._write_pkg_rels(collector, package.rels)
+    PackageWriter._write_parts(collector, package.parts)
+    return collector.items
+
+
+class _RawMember:
+    __slots__ = ('length', 'digest', 'method', 'crc', 'size', 'data')
+
+    def __init__(self, length, digest, method, crc, size, data):
+        # length and digest describe the part as python-docx serializes it, which
+        # need not be byte-identical to the member; the rest describe the member
+        self.length = length
+        self.digest = digest
+        self.method = method
+        self.crc = crc
+        self.size = size
+        self.data = data
+
+
+class TemplatePackage:
+    """Compressed members of a template archive, keyed by member name"""
+
+    def __init__(self, members):
+        self.members = members
+
+    @classmethod
+    def load(cls, path, document):
+        """``document`` must be the python-docx Document freshly loaded from ``path``"""
+        serialized = {name: (len(blob), _digest(blob)) for name, blob in _package_items(document)}
+        members = {}
+        with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+            for info in archive.infolist():
+                if info.filename not in serialized or info.flag_bits & 0x1:
+                    continue
+                if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                    continue
+                f.seek(info.header_offset)
+                header = f.read(_LOCAL_HEADER.size)
+                if len(header) != _LOCAL_HEADER.size or header[:4] != b'PK\x03\x04':
+                    continue
+                name_length, extra_length = struct.unpack('<2H', header[26:30])
+                f.seek(info.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+                length, digest = serialized[info.filename]
+                members[info.filename] = _RawMember(
+                    length, digest, info.compress_type, info.CRC, info.file_size, f.read(info.compress_size)
+                )
+        return cls(members)
+
+    def reusable(self, name, blob):
+        """The template's compressed member if ``blob`` is unchanged from it"""
+        member = self.members.get(name)
+        # The size check skips hashing parts that have obviously changed
+        if member is not None and member.length == len(blob) and member.digest == _digest(blob):
+            return member
+        return None
+
+
+class _ZipWriter:
+    """Just enough of the ZIP format to write members whose CRC and compressed bytes are known.
+
+    Sizes go in the local headers, so it never seeks and works on any
+    writable stream.
+    """
+
+    def __init__(self, fileobj, date_time=None):
+        self._file = fileobj
+        self._offset = 0
+        self._central = []
+        year, month, day, hour, minute, second = (date_time or time.localtime())[:6]
+        self._dos_time = (hour << 11) | (minute << 5) | (second // 2)
+        self._dos_date = ((max(year, 1980) - 1980) << 9) | (month << 5) | day
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+    def add(self, name, method, crc, size, data):
+        if max(size, len(data), self._offset) > _ZIP32_LIMIT or len(self._central) >= 0xFFFF:
+            raise PackagingError('Document is too large to package without ZIP64')
+        encoded = name.encode('utf-8')
+        flags = 0 if name.isascii() else _UTF8_FLAG
+        self._central.append((encoded, flags, method, crc, len(data), size, self._offset))
+        self._write(_LOCAL_HEADER.pack(
+            b'PK\x03\x04', _VERSION, flags, method, self._dos_time, self._dos_date,
+            crc, len(data), size, len(encoded), 0
+        ) + encoded)
+        self._write(data)
+
+    def close(self):
+        start = self._offset
+        for encoded, flags, method, crc, compressed_size, size, offset in self._central:
+            self._write(_CENTRAL_HEADER.pack(
+                b'PK\x01\x02', _VERSION, _VERSION, flags, method, self._dos_time, self._dos_date,
+                crc, compressed_size, size, len(encoded), 0, 0, 0, 0, 0, offset
+            ) + encoded)
+        if self._offset > _ZIP32_LIMIT:
+            raise PackagingError('Document is too large to package without ZIP64')
+        self._write(_END_OF_CENTRAL_DIRECTORY.pack(
+            b'PK\x05\x06', 0, 0, len(self._central), len(self._central), self._offset - start, start, 0
+        ))
+
+
+def _compress(blob, level):
+    if level == 0:
+        return zipfile.ZIP_STORED, blob
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return zipfile.ZIP_DEFLATED, compressor.compress(blob) + compressor.flush()
+
+
+def save(document, output, template_package=None, compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """Write a python-docx Document to ``output`` (a path or writable file object).
+
+    Members unchanged from ``template_package`` are copied without being
+    recompressed; the rest are deflated at ``compression_level`` (0 stores
+    them uncompressed). Returns the number of members copied.
+    """
+    if isinstance(output, str):
+        with open(output, 'wb') as f:
+            return save(document, f, template_package, compression_level)
+
+    for part in document.part.package.parts:
+        part.before_marshal()
+
+    writer = _ZipWriter(output)
+    reused = 0
+    for name, blob in _package_items(document):
+        member = template_package.reusable(name, blob) if template_package is not None else None
+        if member is not None:
+            writer.add(name, member.method, member.crc, member.size, member.data)
+            reused += 1
+        else:
+            method, data = _compress(blob, compression_level)
+            writer.add(name, method, zlib.crc32(blob), len(blob), data)
+    writer.close()
+    return reused
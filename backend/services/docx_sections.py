@@ -0,0 +1,120 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.shared import Pt
+
+from .docx_tables import add_table
+from .sections import SECTIONS, Paragraph, Heading, Table, PageBreak
+
+_ALIGNMENTS = {
+    'center': WD_ALIGN_PARAGRAPH.CENTER,
+    'right': WD_ALIGN_PARAGRAPH.RIGHT,
+    'justify': WD_ALIGN_PARAGRAPH.JUSTIFY,
+}
+
+
+def emit_blocks(doc, blocks):
+    """Write section content blocks into a python-docx Document"""
+    for block in blocks:
+        if isinstance(block, Paragraph):
+            paragraph = doc.add_paragraph(style=block.style)
+            if block.align:
+                paragraph.alignment = _ALIGNMENTS[block.align]
+            for run in block.runs:
+                docx_run = paragraph.add_run(run.text)
+                if run.bold:
+                    docx_run.bold = True
+                if run.size:
+                    docx_run.font.size = Pt(run.size)
+        elif isinstance(block, Heading):
+            doc.add_heading(block.text, level=block.level)
+        elif isinstance(block, Table):
+            add_table(doc, block.headers, block.rows, block.style)
+        elif isinstance(block, PageBreak):
+            doc.add_page_break()
+        else:
+            raise TypeError(f'Unknown block type: {type(block).__name__}')
+
+
+def _body_content(body):
+    """Body children in document order, without the trailing section properties"""
+    return [child for child in body if child.tag != qn('w:sectPr')]
+
+
+class FragmentCache:
+    """LRU cache of rendered OOXML per section, keyed by a hash of the section's inputs.
+
+    Fragments are built into the target document once, copied into the
+    cache, and spliced into later documents as deep copies. Sections that
+    are not cacheable (those reading the members) are always built.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is None:
+                self.misses += 1
+            else:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+            return fragment
+
+    def _store(self, key, fragment):
+        with self._lock:
+            self._fragments[key] = fragment
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_size:
+                self._fragments.popitem(last=False)
+
+    def add_section(self, doc, section, agreement):
+        inputs = section.inputs(agreement)
+        if not section.cacheable:
+            emit_blocks(doc, section.build(inputs))
+            return
+
+        key = section.cache_key(inputs)
+        body = doc.element.body
+
+        fragment = self._lookup(key)
+        if fragment is not None:
+            sectPr = body.find(qn('w:sectPr'))
+            for element in fragment:
+                element = copy.deepcopy(element)
+                if sectPr is not None:
+                    sectPr.addprevious(element)
+                else:
+                    body.append(element)
+            return
+
+        start = len(_body_content(body))
+        emit_blocks(doc, section.build(inputs))
+        added = _body_content(body)[start:]
+        self._store(key, [copy.deepcopy(element) for element in added])
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._fragments), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+fragment_cache = FragmentCache(max_size=int(os.getenv('FRAGMENT_CACHE_SIZE', '256')))
+
+
+def build_document(doc, agreement, sections=SECTIONS):
+    """Assemble the from-scratch agreement from cached or freshly built section fragments"""
+    for section in sections:
+        fragment_cache.add_section(doc, section, agreement)
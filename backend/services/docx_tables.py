@@ -0,0 +1,65 @@
+import copy
+
+from docx.oxml.ns import qn
+from lxml import etree
+
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+
+def add_table(doc, headers, rows, style, bold_header=True):
+    """Append a table with a header row and all data rows in one pass.
+
+    Going through ``table.rows[i].cells[j]`` re-walks the table XML on every
+    access, which makes filling a table quadratic in its row count. Here each
+    ``w:tr`` is emitted directly, reusing the cell properties python-docx
+    generated for the header row, so the cost is linear.
+    """
+    table = doc.add_table(rows=1, cols=len(headers))
+    table.style = style
+
+    tbl = table._tbl
+    template_row = tbl.tr_lst[0]
+    cell_properties = [tc.tcPr for tc in template_row.tc_lst]
+    tbl.remove(template_row)
+
+    _append_row(tbl, headers, cell_properties, bold=bold_header)
+    for row in rows:
+        _append_row(tbl, row, cell_properties)
+    return table
+
+
+def _append_row(tbl, values, cell_properties, bold=False):
+    tr = etree.SubElement(tbl, qn('w:tr'))
+    for value, tcPr in zip(values, cell_properties):
+        tc = etree.SubElement(tr, qn('w:tc'))
+        if tcPr is not None:
+            tc.append(copy.deepcopy(tcPr))
+        p = etree.SubElement(tc, qn('w:p'))
+        _append_run(p, '' if value is None else str(value), bold)
+
+
+def _append_run(p, text, bold):
+    r = etree.SubElement(p, qn('w:r'))
+    if bold:
+        rPr = etree.SubElement(r, qn('w:rPr'))
+        etree.SubElement(rPr, qn('w:b'))
+
+    # Same handling as python-docx's run.text: tabs and line breaks become elements
+    buffer = []
+    for char in text:
+        if char in '\t\n\r':
+            _append_text(r, ''.join(buffer))
+            buffer = []
+            etree.SubElement(r, qn('w:tab') if char == '\t' else qn('w:br'))
+        else:
+            buffer.append(char)
+    _append_text(r, ''.join(buffer))
+
+
+def _append_text(r, text):
+    if not text:
+        return
+    t = etree.SubElement(r, qn('w:t'))
+    t.text = text
+    if text[0].isspace() or text[-1].isspace():
+        t.set(_XML_SPACE, 'preserve')
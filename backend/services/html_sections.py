@@ -0,0 +1,119 @@
+import html
+import os
+import threading
+from collections import OrderedDict
+
+from .sections import SECTIONS, Paragraph, Heading, Table, PageBreak
+
+# docx paragraph styles -> HTML tag and class
+_PARAGRAPH_STYLES = {
+    'Heading 2': ('h3', None),
+    'List Number': ('p', 'list-number'),
+    'List Bullet': ('p', 'list-bullet'),
+}
+
+
+def _css_class(name):
+    return name.lower().replace(' ', '-')
+
+
+def _text(value):
+    return html.escape('' if value is None else str(value)).replace('\n', '<br>')
+
+
+def _paragraph_html(block):
+    tag, css_class = _PARAGRAPH_STYLES.get(block.style, ('p', _css_class(block.style) if block.style else None))
+    attrs = f' class="{css_class}"' if css_class else ''
+    if block.align:
+        attrs += f' style="text-align:{block.align}"'
+
+    runs = []
+    for run in block.runs:
+        text = _text(run.text)
+        if run.size:
+            text = f'<span style="font-size:{run.size}pt">{text}</span>'
+        if run.bold:
+            text = f'<strong>{text}</strong>'
+        runs.append(text)
+    return f'<{tag}{attrs}>{"".join(runs) or "&nbsp;"}</{tag}>'
+
+
+def render_blocks(blocks):
+    """Render section content blocks to an HTML fragment"""
+    parts = []
+    for block in blocks:
+        if isinstance(block, Paragraph):
+            parts.append(_paragraph_html(block))
+        elif isinstance(block, Heading):
+            level = min(block.level + 1, 6)
+            parts.append(f'<h{level}>{_text(block.text)}</h{level}>')
+        elif isinstance(block, Table):
+            head = ''.join(f'<th>{_text(h)}</th>' for h in block.headers)
+            body = ''.join(
+                '<tr>' + ''.join(f'<td>{_text(cell)}</td>' for cell in row) + '</tr>'
+                for row in block.rows
+            )
+            parts.append(f'<table class="{_css_class(block.style)}"><thead><tr>{head}</tr></thead>'
+                         f'<tbody>{body}</tbody></table>')
+        elif isinstance(block, PageBreak):
+            parts.append('<hr class="page-break">')
+        else:
+            raise TypeError(f'Unknown block type: {type(block).__name__}')
+    return ''.join(parts)
+
+
+def sections_affected_by(changed_fields, sections=SECTIONS):
+    """Sections whose declared inputs include any of the changed fields.
+
+    Field names may be columns ('purpose'), data keys with or without the
+    'data.' prefix, or 'members' / 'members.<anything>'.
+    """
+    affected = []
+    for section in sections:
+        for changed in changed_fields:
+            if changed.startswith('members'):
+                hit = 'members' in section.fields
+            else:
+                hit = changed in section.fields or f'data.{changed}' in section.fields
+            if hit:
+                affected.append(section)
+                break
+    return affected
+
+
+class HtmlSectionCache:
+    """LRU of rendered section HTML keyed by the hash of each section's inputs"""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, section, agreement):
+        inputs = section.inputs(agreement)
+        key = section.cache_key(inputs)
+
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+
+        fragment = f'<section data-section="{section.name}">{render_blocks(section.build(inputs))}</section>'
+        with self._lock:
+            self._fragments[key] = fragment
+            while len(self._fragments) > self.max_size:
+                self._fragments.popitem(last=False)
+        return fragment
+
+
+html_section_cache = HtmlSectionCache(max_size=int(os.getenv('PREVIEW_CACHE_SIZE', '1024')))
+
+
+def render_preview(agreement, sections=SECTIONS):
+    """[(section name, html)] for the requested sections, in document order"""
+    return [(section.name, html_section_cache.render(section, agreement)) for section in sections]
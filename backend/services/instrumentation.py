@@ -0,0 +1,204 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .query_counter import current_counter
+
+_current = contextvars.ContextVar('request_timings', default=None)
+_NULL_PHASE = nullcontext()
+_listening = False
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+class _Phase:
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timings.add(self.name, time.perf_counter() - self.started)
+
+
+def phase(name):
+    """Time a block as part of the current request; a no-op outside requests or when disabled"""
+    timings = _current.get()
+    if timings is None:
+        return _NULL_PHASE
+    return _Phase(timings, name)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format"""
+
+    def __init__(self, name, help_text, label_names, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_items = [(labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items()]
+        for labels, (counts, total, count) in sorted(series_items):
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            suffix = f'{{{label_text}}}' if label_text else ''
+            lines.append(f'{self.name}_sum{suffix} {total}')
+            lines.append(f'{self.name}_count{suffix} {count}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_duration = Histogram(
+    'opag_http_request_duration_seconds', 'Time to produce the response, including streamed bodies',
+    ('method', 'endpoint', 'status')
+)
+phase_duration = Histogram(
+    'opag_http_request_phase_seconds', 'Time spent per request phase (db, context, render, save, ...)',
+    ('endpoint', 'phase')
+)
+query_count = Histogram(
+    'opag_http_request_db_queries', 'SQL statements issued per request',
+    ('endpoint',), buckets=QUERY_COUNT_BUCKETS
+)
+
+
+# The only engine-wide cursor listeners: they feed both the request timings
+# and the query budget counter (services.query_counter)
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = current_counter()
+    if counter is not None:
+        counter.record(statement)
+    if _current.get() is not None:
+        conn.info.setdefault('instrumentation_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    started = conn.info.get('instrumentation_started')
+    if timings is not None and started:
+        timings.add('db', time.perf_counter() - started.pop())
+        timings.queries += 1
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('instrumentation_started'):
+        connection.info['instrumentation_started'].pop()
+
+
+def _start_request():
+    g._request_timings_token = _current.set(RequestTimings())
+
+
+def _finish_request(response):
+    timings = _current.get()
+    if timings is None:
+        return response
+
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    elapsed = time.perf_counter() - timings.started
+
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.phases.items()]
+    entries.append(f'queries;desc="{timings.queries} queries"')
+    entries.append(f'app;dur={elapsed * 1000:.2f}')
+    response.headers['Server-Timing'] = ', '.join(entries)
+
+    method = request.method
+    status = str(response.status_code)
+
+    def record():
+        # Runs once the body (possibly streamed) has been sent
+        timings.add('stream', max(time.perf_counter() - timings.started - elapsed, 0.0))
+        request_duration.observe((method, endpoint, status), time.perf_counter() - timings.started)
+        for name, seconds in timings.phases.items():
+            phase_duration.observe((endpoint, name), seconds)
+        query_count.observe((endpoint,), timings.queries)
+
+    response.call_on_close(record)
+    return response
+
+
+def _teardown_request(exc):
+    token = g.pop('_request_timings_token', None)
+    if token is not None:
+        _current.reset(token)
+
+
+def metrics():
+    body = '\n'.join(h.render() for h in (request_duration, phase_duration, query_count)) + '\n'
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+def _listen_for_queries():
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listening = True
+
+
+def init_instrumentation(app):
+    """Register timing hooks and /metrics unless INSTRUMENTATION_ENABLED is false.
+
+    When disabled no request hooks are registered and phase() stays a
+    no-op; the engine listeners are still installed if QUERY_BUDGET_MODE
+    needs them to count statements.
+    """
+    app.config.setdefault('INSTRUMENTATION_ENABLED', True)
+    app.config.setdefault('QUERY_BUDGET_MODE', 'off')
+    if app.config['INSTRUMENTATION_ENABLED'] or app.config['QUERY_BUDGET_MODE'] != 'off':
+        _listen_for_queries()
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics)
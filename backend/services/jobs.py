@@ -0,0 +1,209 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+
+from models import db, GenerationJob
+from . import repository
+from .document_generator import DocumentGenerator
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+FINISHED_STATUSES = ('succeeded', 'failed')
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    """Document generation jobs stored in the database and run by local worker threads.
+
+    Jobs are claimed with a conditional UPDATE, so several processes can
+    share the same table without an external broker.
+    """
+
+    def __init__(self):
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_QUEUE_MAX_DEPTH', 500)
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 3)
+        app.config.setdefault('JOB_RETRY_DELAY', 5)
+        app.config.setdefault('JOB_LEASE_SECONDS', 600)
+        app.config.setdefault('JOB_POLL_INTERVAL', 1.0)
+        app.config.setdefault('JOB_RESULT_TTL', 24 * 60 * 60)
+
+    def start(self):
+        if self._threads:
+            return
+
+        with self.app.app_context():
+            self.recover_stale()
+
+        for i in range(self.app.config['JOB_WORKERS']):
+            thread = threading.Thread(target=self._worker_loop, name=f'generation-job-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def enqueue(self, agreement_id, template_name='default'):
+        depth = GenerationJob.query.filter(GenerationJob.status.in_(ACTIVE_STATUSES)).count()
+        if depth >= self.app.config['JOB_QUEUE_MAX_DEPTH']:
+            raise QueueFullError(f'Queue is full ({depth} jobs pending)')
+
+        job = GenerationJob(
+            agreement_id=agreement_id,
+            template=template_name,
+            max_attempts=self.app.config['JOB_MAX_ATTEMPTS']
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return job
+
+    def recover_stale(self):
+        """Requeue jobs whose worker died mid-render (e.g. a restart), or fail them once out of attempts"""
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.app.config['JOB_LEASE_SECONDS'])
+        stale = (GenerationJob.status == 'running', GenerationJob.started_at < cutoff)
+        # A job that keeps killing its worker must not be retried forever
+        failed = db.session.execute(
+            update(GenerationJob)
+            .where(*stale, GenerationJob.attempts >= GenerationJob.max_attempts)
+            .values(status='failed', finished_at=now, error='Worker stopped while running the job')
+        )
+        requeued = db.session.execute(
+            update(GenerationJob)
+            .where(*stale)
+            .values(status='queued', run_after=now)
+        )
+        db.session.commit()
+        if requeued.rowcount:
+            logger.warning('Requeued %d stale generation jobs', requeued.rowcount)
+        if failed.rowcount:
+            logger.error('Failed %d stale generation jobs that ran out of attempts', failed.rowcount)
+
+    def purge_finished(self, ttl=None):
+        """Delete finished jobs, with their stored documents, once they are older than the TTL"""
+        ttl = self.app.config['JOB_RESULT_TTL'] if ttl is None else ttl
+        if ttl <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+        result = db.session.execute(
+            delete(GenerationJob)
+            .where(GenerationJob.status.in_(FINISHED_STATUSES), GenerationJob.finished_at < cutoff)
+        )
+        db.session.commit()
+        if result.rowcount:
+            logger.info('Purged %d finished generation jobs', result.rowcount)
+        return result.rowcount
+
+    def _claim_next(self):
+        now = datetime.utcnow()
+        candidates = db.session.execute(
+            db.select(GenerationJob.id)
+            .where(GenerationJob.status == 'queued', GenerationJob.run_after <= now)
+            .order_by(GenerationJob.created_at)
+            .limit(5)
+        ).scalars().all()
+
+        for job_id in candidates:
+            claimed = db.session.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id, GenerationJob.status == 'queued')
+                .values(status='running', started_at=now, attempts=GenerationJob.attempts + 1)
+            )
+            db.session.commit()
+            if claimed.rowcount == 1:
+                return job_id
+        return None
+
+    def _worker_loop(self):
+        poll_interval = self.app.config['JOB_POLL_INTERVAL']
+        last_recovery = datetime.utcnow()
+
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    # Housekeeping runs once per lease period in each worker thread
+                    if datetime.utcnow() - last_recovery > timedelta(seconds=self.app.config['JOB_LEASE_SECONDS']):
+                        self.recover_stale()
+                        self.purge_finished()
+                        last_recovery = datetime.utcnow()
+
+                    job_id = self._claim_next()
+                    if job_id is not None:
+                        self._run(job_id)
+                        continue
+                except Exception:
+                    logger.exception('Generation job worker error')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+            self._wakeup.wait(poll_interval)
+            self._wakeup.clear()
+
+    def _run(self, job_id):
+        job = db.session.get(GenerationJob, job_id)
+        try:
+            agreement = repository.get_agreement(job.agreement_id, 'render')
+            if agreement is None:
+                raise LookupError(f'Agreement {job.agreement_id} no longer exists')
+            buffer = DocumentGenerator().generate_to_buffer(agreement, job.template)
+            with buffer:
+                content = buffer.read()
+        except Exception as exc:
+            db.session.rollback()
+            job = db.session.get(GenerationJob, job_id)
+            job.error = f'{type(exc).__name__}: {exc}'
+            if job.attempts < job.max_attempts:
+                delay = self.app.config['JOB_RETRY_DELAY'] * 2 ** (job.attempts - 1)
+                job.status = 'queued'
+                job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+                logger.warning('Generation job %s failed (attempt %d), retrying in %ss', job_id, job.attempts, delay)
+            else:
+                job.status = 'failed'
+                job.finished_at = datetime.utcnow()
+                logger.error('Generation job %s failed permanently: %s', job_id, job.error)
+        else:
+            job.status = 'succeeded'
+            job.result = content
+            job.result_size = len(content)
+            job.error = None
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'agreement_id': job.agreement_id,
+        'template': job.template,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'error': job.error,
+        'result_size': job.result_size,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+job_queue = JobQueue()
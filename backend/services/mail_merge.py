@@ -0,0 +1,80 @@
+"""
+Mail merge: one personalised document per member of an agreement.
+
+The template is parsed once (through the template cache) and the agreement
+context built once; each member's document is that shared context with the
+member's own values layered on top, so the per-member cost is the render and
+save alone. Everything is read from the agreement up front, so the archive
+can be streamed after the request's session is gone.
+"""
+
+import io
+import os
+from datetime import datetime
+
+from .batch import safe_filename
+from .document_generator import DocumentGenerator
+from .streaming import iter_documents_zip
+from .template_cache import template_cache
+
+# Context keys a member's document adds to the agreement context
+MEMBER_CONTEXT_KEYS = ('member',)
+
+
+class TemplateNotFound(LookupError):
+    pass
+
+
+class MailMerge:
+    def __init__(self, agreement, template_name, member_ids=None, generator=None):
+        self.generator = generator or DocumentGenerator()
+        self.template_name = template_name
+        self.agreement_id = agreement.id
+
+        path = self.generator.template_path(template_name)
+        if not os.path.exists(path):
+            raise TemplateNotFound(f"Template '{template_name}' not found")
+        self.compiled = template_cache.get(template_name, path)
+        self.shared_context = self.generator.prepare_context(agreement)
+
+        members = agreement.members
+        if member_ids is not None:
+            wanted = set(member_ids)
+            members = [m for m in members if m.id in wanted]
+            self.missing_member_ids = sorted(wanted - {m.id for m in members})
+        else:
+            self.missing_member_ids = []
+        self.member_contexts = [self.generator.member_context(m) for m in members]
+
+    def missing_variables(self, required):
+        """Template variables neither the agreement nor the member context would provide"""
+        return set(required) - set(self.shared_context) - set(MEMBER_CONTEXT_KEYS)
+
+    def render(self, member_context, output):
+        doc = self.compiled.render({**self.shared_context, **member_context})
+        self.generator.save_rendered(doc, output, self.compiled)
+
+    def iter_zip(self):
+        """Yield a ZIP archive of every member's document, one chunk per document"""
+        manifest = {
+            'agreement_id': self.agreement_id,
+            'template': self.template_name,
+            'generated_at': datetime.utcnow().isoformat(),
+            'documents': [{'member_id': i, 'status': 'not_found'} for i in self.missing_member_ids]
+        }
+        return iter_documents_zip(self._results(), manifest)
+
+    def _results(self):
+        for member_context in self.member_contexts:
+            member = member_context['member']
+            entry = {'member_id': member['id'], 'name': member['name']}
+            buffer = io.BytesIO()
+            try:
+                self.render(member_context, buffer)
+            except Exception as exc:
+                entry.update(status='error', error=f'{type(exc).__name__}: {exc}')
+                yield entry, None
+            else:
+                filename = f"{member['id']}_{safe_filename(member['name'], 'member')}.docx"
+                entry.update(status='ok', filename=filename, size=buffer.tell())
+                yield entry, buffer.getvalue()
@@ -0,0 +1,41 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(updated_at, row_id):
+    payload = json.dumps([updated_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        updated_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(updated_at), int(row_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor('Invalid cursor') from exc
+
+
+def keyset_after(timestamp_column, id_column, cursor):
+    """Rows strictly after the cursor in (timestamp DESC, id DESC) order"""
+    updated_at, row_id = decode_cursor(cursor)
+    return or_(
+        timestamp_column < updated_at,
+        and_(timestamp_column == updated_at, id_column < row_id)
+    )
+
+
+def page_size(value):
+    if value is None or value < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(value, MAX_PAGE_SIZE)
@@ -0,0 +1,144 @@
+from datetime import datetime
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(value).date()
+
+
+def _text(value):
+    if not isinstance(value, str):
+        raise TypeError('must be a string')
+    return value
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError('must be a number')
+    return value
+
+
+def _flag(value):
+    if not isinstance(value, bool):
+        raise TypeError('must be true or false')
+    return value
+
+
+# Agreement columns a PATCH may set directly, with the parser for incoming JSON values
+AGREEMENT_PATCH_FIELDS = {
+    'company_name': _text,
+    'state': _text,
+    'formation_date': _parse_date,
+    'effective_date': _parse_date,
+    'manager_name': _text,
+    'manager_entity': _text,
+    'principal_place_of_business': _text,
+    'registered_agent': _text,
+    'purpose': _text,
+}
+# NOT NULL columns, plus the state every generated document names, which can't be cleared
+REQUIRED_AGREEMENT_FIELDS = frozenset(('company_name', 'formation_date', 'effective_date', 'state'))
+
+# JSON member keys -> (Member attribute, parser)
+MEMBER_PATCH_FIELDS = {
+    'name': ('name', _text),
+    'entity_name': ('entity_name', _text),
+    'class': ('member_class', _text),
+    'units': ('units', _number),
+    'capital_commitment': ('capital_commitment', _number),
+    'percentage_interest': ('percentage_interest', _number),
+    'is_manager': ('is_manager', _flag),
+    'address': ('address', _text),
+    'email': ('email', _text),
+}
+# Member keys that can't be cleared: NOT NULL, or summed into the cap table
+REQUIRED_MEMBER_FIELDS = frozenset(('name', 'class', 'units', 'capital_commitment', 'percentage_interest'))
+
+
+class PatchError(ValueError):
+    pass
+
+
+def merge_patch(target, patch):
+    """Apply an RFC 7386 JSON merge patch and return the result"""
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def assign_changed(obj, values):
+    """Set only attributes whose value differs, so untouched columns stay out of the UPDATE"""
+    changed = []
+    for attr, value in values.items():
+        if getattr(obj, attr) != value:
+            setattr(obj, attr, value)
+            changed.append(attr)
+    return changed
+
+
+def agreement_field_values(fields):
+    if not isinstance(fields, dict):
+        raise PatchError('fields must be an object')
+    values = {}
+    for key, value in fields.items():
+        if key not in AGREEMENT_PATCH_FIELDS:
+            raise PatchError(f'Field cannot be patched: {key}')
+        if value is None or value == '':
+            if key in REQUIRED_AGREEMENT_FIELDS:
+                raise PatchError(f'{key} cannot be empty')
+            values[key] = None
+            continue
+        try:
+            values[key] = AGREEMENT_PATCH_FIELDS[key](value)
+        except (TypeError, ValueError) as exc:
+            raise PatchError(f'Invalid value for {key}: {exc}') from exc
+    return values
+
+
+def member_field_values(member_data, path='member'):
+    """Member attributes from a JSON member; ``path`` (e.g. ``members.add[0]``) prefixes errors"""
+    values = {}
+    for key, value in member_data.items():
+        if key == 'id':
+            continue
+        if key not in MEMBER_PATCH_FIELDS:
+            raise PatchError(f'Member field cannot be patched: {key}')
+        attr, parse = MEMBER_PATCH_FIELDS[key]
+        if value is None or value == '':
+            if key in REQUIRED_MEMBER_FIELDS:
+                raise PatchError(f'{path}.{key} cannot be empty')
+            values[attr] = None
+            continue
+        try:
+            values[attr] = parse(value)
+        except (TypeError, ValueError) as exc:
+            raise PatchError(f'{path}.{key} {exc}') from exc
+    return values
+
+
+def validate_member_diff(member_diff):
+    """Check the shape of a PATCH ``members`` diff before any member is loaded"""
+    if not isinstance(member_diff, dict):
+        raise PatchError('members must be an object with add, update and remove lists')
+    for key in member_diff:
+        if key not in ('add', 'update', 'remove'):
+            raise PatchError(f'Unknown members operation: {key}')
+    for key in ('add', 'update', 'remove'):
+        if not isinstance(member_diff.get(key, []), list):
+            raise PatchError(f'members.{key} must be a list')
+    for key in ('add', 'update'):
+        for i, member_data in enumerate(member_diff.get(key, [])):
+            if not isinstance(member_data, dict):
+                raise PatchError(f'members.{key}[{i}] must be an object')
+    for i, member_data in enumerate(member_diff.get('update', [])):
+        if isinstance(member_data.get('id'), bool) or not isinstance(member_data.get('id'), int):
+            raise PatchError(f'members.update[{i}].id must be a member id')
+    for i, member_id in enumerate(member_diff.get('remove', [])):
+        if isinstance(member_id, bool) or not isinstance(member_id, int):
+            raise PatchError(f'members.remove[{i}] must be a member id')
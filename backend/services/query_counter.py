@@ -0,0 +1,67 @@
+import contextvars
+import functools
+import logging
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('query_counter', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def record(self, statement):
+        self.count += 1
+        self.statements.append(statement)
+
+
+def init_query_counter(app):
+    """Enable query counting when QUERY_BUDGET_MODE is 'warn' or 'strict'.
+
+    In 'warn' mode an endpoint over its budget logs a warning; in 'strict'
+    mode (meant for tests) it raises QueryBudgetExceeded. Statements are
+    counted by the engine listeners in services.instrumentation, which
+    init_instrumentation installs whenever a budget mode is on.
+    """
+    app.config.setdefault('QUERY_BUDGET_MODE', 'off')
+
+
+def current_counter():
+    return _current.get()
+
+
+def query_budget(limit):
+    """Fail or warn when the decorated view issues more than ``limit`` queries"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            mode = current_app.config.get('QUERY_BUDGET_MODE', 'off')
+            if mode == 'off':
+                return view(*args, **kwargs)
+
+            counter = QueryCounter()
+            token = _current.set(counter)
+            try:
+                response = view(*args, **kwargs)
+            finally:
+                _current.reset(token)
+
+            if counter.count > limit:
+                message = (
+                    f'{view.__name__} issued {counter.count} queries (budget {limit}):\n'
+                    + '\n'.join(counter.statements)
+                )
+                if mode == 'strict':
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        return wrapper
+    return decorator
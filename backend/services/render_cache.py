@@ -0,0 +1,151 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .snapshot import agreement_to_dict
+
+
+def document_key(agreement, template_version):
+    """Content hash of the agreement row, its members, data and template version"""
+    payload = json.dumps(
+        {'agreement': agreement_to_dict(agreement), 'template': template_version},
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """Rendered documents keyed by content hash.
+
+    Recently used documents are held in memory up to ``max_memory_bytes``;
+    anything evicted from memory is spilled to ``disk_dir`` and served from
+    there until the agreement is invalidated.
+    """
+
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_bytes=1024 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # key -> (agreement_id, bytes)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, agreement_id, key):
+        return os.path.join(self.disk_dir, f'{agreement_id}-{key}.docx')
+
+    def get(self, agreement_id, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(agreement_id, key), 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                return content
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, agreement_id, key, content):
+        spilled = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous[1])
+
+            self._entries[key] = (agreement_id, content)
+            self._memory_bytes += len(content)
+
+            while self._memory_bytes > self.max_memory_bytes and self._entries:
+                old_key, (old_agreement_id, old_content) = self._entries.popitem(last=False)
+                self._memory_bytes -= len(old_content)
+                spilled.append((old_agreement_id, old_key, old_content))
+
+        for old_agreement_id, old_key, old_content in spilled:
+            self._spill(old_agreement_id, old_key, old_content)
+
+    def _spill(self, agreement_id, key, content):
+        if not self.disk_dir or len(content) > self.max_disk_bytes:
+            return
+
+        path = self._disk_path(agreement_id, key)
+        if os.path.exists(path):
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop the oldest spilled documents once the directory exceeds its cap"""
+        files = []
+        total = 0
+        for path in glob.glob(os.path.join(self.disk_dir, '*.docx')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def invalidate_agreement(self, agreement_id):
+        with self._lock:
+            stale = [k for k, (a_id, _) in self._entries.items() if a_id == agreement_id]
+            for key in stale:
+                self._memory_bytes -= len(self._entries.pop(key)[1])
+
+        if self.disk_dir:
+            for path in glob.glob(os.path.join(self.disk_dir, f'{agreement_id}-*.docx')):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses
+            }
+
+
+render_cache = RenderCache(
+    max_memory_bytes=int(os.getenv('RENDER_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    disk_dir=os.getenv('RENDER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'opag-render-cache')),
+    max_disk_bytes=int(os.getenv('RENDER_CACHE_MAX_DISK_BYTES', str(1024 * 1024 * 1024)))
+)
@@ -0,0 +1,40 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import Agreement, Member
+
+# Loader options per use case. Each plan loads the graph it needs in a fixed
+# number of queries, whatever the number of members.
+LOAD_PLANS = {
+    # Agreement row only (1 query)
+    'summary': (),
+    # Agreement + members (2 queries): the agreement detail endpoint
+    'view': (
+        selectinload(Agreement.members),
+    ),
+    # Agreement + capital structure joined, members batched (2 queries): document rendering
+    'render': (
+        joinedload(Agreement.capital_structure),
+        selectinload(Agreement.members),
+    ),
+    # Everything, including each member's capital calls (3 queries)
+    'full': (
+        joinedload(Agreement.capital_structure),
+        selectinload(Agreement.members).selectinload(Member.capital_commitments),
+    ),
+}
+
+
+def agreement_query(plan='view'):
+    return Agreement.query.options(*LOAD_PLANS[plan])
+
+
+def get_agreement(agreement_id, plan='view'):
+    return agreement_query(plan).filter(Agreement.id == agreement_id).one_or_none()
+
+
+def get_agreement_or_404(agreement_id, plan='view'):
+    return agreement_query(plan).filter(Agreement.id == agreement_id).first_or_404()
+
+
+def get_agreements(agreement_ids, plan='render'):
+    return agreement_query(plan).filter(Agreement.id.in_(agreement_ids)).order_by(Agreement.id).all()
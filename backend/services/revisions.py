@@ -0,0 +1,300 @@
+"""
+Agreement revision history.
+
+Every save stores either a delta against the previous revision or, every
+REVISION_CHECKPOINT_INTERVAL revisions, a full checkpoint. Any revision is
+rebuilt from the nearest checkpoint at or before it plus at most
+interval - 1 deltas, so reconstruction cost is bounded whatever the
+history length, and each delta is only as large as the edit it records.
+
+A revision's state is ``{'fields': {...}, 'data': {...}, 'members': {id: {...}}}``.
+Deltas are nested ``{'set': {...}, 'unset': [...], 'nested': {key: delta}}``
+dicts over that state.
+"""
+
+import json
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import insert, or_, select
+
+from models import db, AgreementRevision
+from .snapshot import MEMBER_FIELDS
+
+DEFAULT_CHECKPOINT_INTERVAL = 20
+
+STATE_FIELDS = (
+    'company_name', 'state', 'formation_date', 'effective_date', 'manager_name', 'manager_entity',
+    'principal_place_of_business', 'registered_agent', 'purpose'
+)
+STATE_MEMBER_FIELDS = tuple(f for f in MEMBER_FIELDS if f != 'id')
+MEMBER_DEFAULTS = {'units': 0, 'capital_commitment': 0, 'percentage_interest': 0, 'is_manager': False}
+
+
+class RevisionNotFound(LookupError):
+    pass
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def member_state(member):
+    return {field: _json_value(getattr(member, field)) for field in STATE_MEMBER_FIELDS}
+
+
+def revision_state(agreement):
+    """Full state of an ORM agreement, as stored in a checkpoint"""
+    return {
+        'fields': {field: _json_value(getattr(agreement, field)) for field in STATE_FIELDS},
+        'data': agreement.data or {},
+        'members': {str(m.id): member_state(m) for m in agreement.members},
+    }
+
+
+def state_from_values(values, member_rows):
+    """Full state from bulk-insert values; member_rows must carry their new ids"""
+    return {
+        'fields': {field: _json_value(values.get(field)) for field in STATE_FIELDS},
+        'data': values.get('data') or {},
+        'members': {
+            str(row['id']): {field: _json_value(row.get(field, MEMBER_DEFAULTS.get(field))) for field in STATE_MEMBER_FIELDS}
+            for row in member_rows
+        },
+    }
+
+
+def diff(old, new):
+    """Delta that turns dict ``old`` into dict ``new``; nested dicts are diffed recursively"""
+    delta = {}
+    for key, value in new.items():
+        if key not in old:
+            delta.setdefault('set', {})[key] = value
+        elif old[key] != value:
+            if isinstance(old[key], dict) and isinstance(value, dict):
+                delta.setdefault('nested', {})[key] = diff(old[key], value)
+            else:
+                delta.setdefault('set', {})[key] = value
+    unset = [key for key in old if key not in new]
+    if unset:
+        delta['unset'] = unset
+    return delta
+
+
+def apply_delta(state, delta):
+    """Return a new state with ``delta`` applied; unchanged branches are shared, not copied"""
+    result = dict(state)
+    for key in delta.get('unset', ()):
+        result.pop(key, None)
+    result.update(delta.get('set', {}))
+    for key, nested in delta.get('nested', {}).items():
+        result[key] = apply_delta(result.get(key) or {}, nested)
+    return result
+
+
+def edit_delta(agreement, fields=(), old_data=None, added=(), updated=None, removed=()):
+    """Delta for an edit whose changes are already known, without loading unchanged members.
+
+    ``fields`` are changed column names, ``old_data`` the data before the
+    edit (omit if data did not change), ``added`` new Member objects,
+    ``updated`` maps member objects to their changed attributes and
+    ``removed`` lists deleted member ids.
+    """
+    delta = {}
+    if fields:
+        delta['fields'] = {'set': {f: _json_value(getattr(agreement, f)) for f in fields}}
+    if old_data is not None:
+        data_delta = diff(old_data or {}, agreement.data or {})
+        if data_delta:
+            delta['data'] = data_delta
+
+    members = {}
+    if added:
+        members['set'] = {str(m.id): member_state(m) for m in added}
+    if updated:
+        members['nested'] = {
+            str(m.id): {'set': {attr: _json_value(getattr(m, attr)) for attr in attrs}}
+            for m, attrs in updated.items() if attrs
+        }
+    if removed:
+        members['unset'] = [str(member_id) for member_id in removed]
+    if members:
+        delta['members'] = members
+    return {'nested': delta} if delta else {}
+
+
+def changed_paths(delta):
+    """Top-level summary of what a delta touches, e.g. ['fields.purpose', 'data', 'members']"""
+    nested = delta.get('nested', {})
+    paths = [f'fields.{name}' for name in sorted(nested.get('fields', {}).get('set', {}))]
+    paths += [key for key in ('data', 'members') if key in nested]
+    return paths
+
+
+def _checkpoint_interval():
+    return current_app.config.get('REVISION_CHECKPOINT_INTERVAL', DEFAULT_CHECKPOINT_INTERVAL)
+
+
+def _has_revisions(agreement_id):
+    return db.session.execute(
+        select(AgreementRevision.id).where(AgreementRevision.agreement_id == agreement_id).limit(1)
+    ).first() is not None
+
+
+def _revision(agreement_id, revision, kind, payload, changed=None):
+    return AgreementRevision(
+        agreement_id=agreement_id,
+        revision=revision,
+        kind=kind,
+        payload=payload,
+        size=len(json.dumps(payload, separators=(',', ':'))),
+        changed=changed
+    )
+
+
+def record_revision(agreement, delta=None):
+    """Store the agreement's current version. Call after flush (so version is final), before commit.
+
+    Without a delta, or on checkpoint boundaries, or when the agreement
+    predates revision history, a full checkpoint is stored instead.
+    """
+    revision = agreement.version
+    checkpoint = (
+        delta is None
+        or revision == 1
+        or revision % _checkpoint_interval() == 0
+        or not _has_revisions(agreement.id)
+    )
+    changed = changed_paths(delta) if delta is not None else None
+    if checkpoint:
+        entry = _revision(agreement.id, revision, 'checkpoint', revision_state(agreement), changed)
+    else:
+        entry = _revision(agreement.id, revision, 'delta', delta, changed)
+    db.session.add(entry)
+    return entry
+
+
+def record_bulk_checkpoints(states):
+    """Insert first-revision checkpoints for newly bulk-inserted agreements: [(agreement_id, state)]"""
+    if states:
+        db.session.execute(insert(AgreementRevision), [
+            {
+                'agreement_id': agreement_id,
+                'revision': 1,
+                'kind': 'checkpoint',
+                'payload': state,
+                'size': len(json.dumps(state, separators=(',', ':'))),
+                'created_at': datetime.utcnow(),
+            }
+            for agreement_id, state in states
+        ])
+
+
+def list_revisions(agreement_id, before=None, limit=50):
+    """Newest first, without payloads"""
+    query = AgreementRevision.query.filter(AgreementRevision.agreement_id == agreement_id)
+    if before is not None:
+        query = query.filter(AgreementRevision.revision < before)
+    return query.order_by(AgreementRevision.revision.desc()).limit(limit).all()
+
+
+def _checkpoint_at_or_before(agreement_id, revision):
+    checkpoint = db.session.execute(
+        select(AgreementRevision.revision)
+        .where(AgreementRevision.agreement_id == agreement_id,
+               AgreementRevision.kind == 'checkpoint',
+               AgreementRevision.revision <= revision)
+        .order_by(AgreementRevision.revision.desc())
+        .limit(1)
+    ).scalar()
+    if checkpoint is None:
+        raise RevisionNotFound(f'Revision {revision} is not available')
+    return checkpoint
+
+
+def states_at(agreement_id, revisions):
+    """{revision: state} for each requested revision, replaying from the nearest checkpoints.
+
+    Revisions that share a checkpoint are rebuilt in a single pass.
+    """
+    wanted = sorted(set(revisions))
+    ranges = {}
+    for revision in wanted:
+        start = _checkpoint_at_or_before(agreement_id, revision)
+        ranges[start] = max(ranges.get(start, revision), revision)
+
+    rows = db.session.execute(
+        select(AgreementRevision.revision, AgreementRevision.kind, AgreementRevision.payload)
+        .where(AgreementRevision.agreement_id == agreement_id,
+               or_(*(AgreementRevision.revision.between(start, end) for start, end in ranges.items())))
+        .order_by(AgreementRevision.revision)
+    ).all()
+
+    states = {}
+    state = None
+    for revision, kind, payload in rows:
+        state = payload if kind == 'checkpoint' else apply_delta(state, payload)
+        if revision in wanted:
+            states[revision] = state
+    missing = [r for r in wanted if r not in states]
+    if missing:
+        raise RevisionNotFound(f'Revision {missing[0]} is not available')
+    return states
+
+
+def state_to_dict(revision, state):
+    return {
+        'revision': revision,
+        **state['fields'],
+        'data': state['data'],
+        'members': [
+            {'id': int(member_id), **member}
+            for member_id, member in sorted(state['members'].items(), key=lambda item: int(item[0]))
+        ],
+    }
+
+
+def _leaf_changes(old, new, prefix=''):
+    """Flattened [{'path', 'from', 'to'}] for every leaf that differs between two JSON values"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in sorted(old.keys() | new.keys(), key=str):
+            changes += _leaf_changes(old.get(key), new.get(key), f'{prefix}.{key}' if prefix else str(key))
+        return changes
+    if old != new:
+        return [{'path': prefix, 'from': old, 'to': new}]
+    return []
+
+
+def diff_states(old, new):
+    """Field, data and member level differences between two states"""
+    fields = {
+        field: {'from': old['fields'].get(field), 'to': new['fields'].get(field)}
+        for field in STATE_FIELDS if old['fields'].get(field) != new['fields'].get(field)
+    }
+
+    old_members, new_members = old['members'], new['members']
+    changed = []
+    for member_id in sorted(old_members.keys() & new_members.keys(), key=int):
+        before, after = old_members[member_id], new_members[member_id]
+        if before != after:
+            changed.append({
+                'id': int(member_id),
+                'name': after.get('name'),
+                'changes': {f: {'from': before.get(f), 'to': after.get(f)}
+                            for f in STATE_MEMBER_FIELDS if before.get(f) != after.get(f)}
+            })
+
+    return {
+        'fields': fields,
+        'data': _leaf_changes(old['data'], new['data']),
+        'members': {
+            'added': [{'id': int(i), **new_members[i]} for i in sorted(new_members.keys() - old_members.keys(), key=int)],
+            'removed': [{'id': int(i), **old_members[i]} for i in sorted(old_members.keys() - new_members.keys(), key=int)],
+            'changed': changed,
+        },
+    }
@@ -0,0 +1,48 @@
+"""
+In-place upgrades for databases created before a schema change.
+
+``db.create_all()`` creates missing tables (with their indexes) but never
+alters existing ones, so columns and indexes added to existing tables are
+added here; ``flask init-db`` runs ``upgrade_schema`` after ``create_all``.
+Every step checks the live schema first, so running it again is harmless.
+"""
+
+from sqlalchemy import inspect, text
+
+from models import db
+
+# (table, column, DDL) for columns added to tables that already existed
+ADDED_COLUMNS = (
+    ('agreements', 'version', 'ALTER TABLE agreements ADD COLUMN version INTEGER NOT NULL DEFAULT 1'),
+)
+
+
+def add_missing_columns(connection):
+    inspector = inspect(connection)
+    added = []
+    for table, column, ddl in ADDED_COLUMNS:
+        if column not in {c['name'] for c in inspector.get_columns(table)}:
+            connection.execute(text(ddl))
+            added.append(f'{table}.{column}')
+    return added
+
+
+def create_missing_indexes(connection):
+    """Create every index declared on the models that the database lacks"""
+    inspector = inspect(connection)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not table.indexes or not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(bind=connection, checkfirst=True)
+                created.append(index.name)
+    return created
+
+
+def upgrade_schema():
+    """Bring an existing database up to the current models; returns what was added"""
+    connection = db.session.connection()
+    return add_missing_columns(connection) + create_missing_indexes(connection)
@@ -0,0 +1,242 @@
+"""
+Full-text search over agreements.
+
+One index row per agreement covers the company name, purpose, manager,
+member and entity names, and the ``data`` keys listed in SEARCH_DATA_KEYS.
+SQLite uses an FTS5 virtual table ranked with bm25(); PostgreSQL uses a
+weighted tsvector column with a GIN index ranked with ts_rank_cd().
+
+Rows are rewritten in the same transaction as the change that affects
+them (create, PUT, PATCH, bulk import); ``rebuild_index`` repopulates
+everything, e.g. after changing SEARCH_DATA_KEYS.
+"""
+
+import re
+
+from flask import current_app
+from sqlalchemy import DateTime, select, text
+
+from models import db, Agreement, Member
+
+DEFAULT_DATA_KEYS = ('title', 'class_a_rights', 'class_b_rights', 'class_c_rights')
+MAX_QUERY_TERMS = 16
+REBUILD_BATCH_SIZE = 1000
+
+# Column order of the index; weights rank a hit in the company name above one in data
+INDEX_COLUMNS = ('company_name', 'manager', 'members', 'purpose', 'data')
+COLUMN_WEIGHTS = {'company_name': 10.0, 'manager': 5.0, 'members': 4.0, 'purpose': 2.0, 'data': 1.0}
+
+# Agreement fields whose changes require the index row to be rewritten
+INDEXED_FIELDS = frozenset(('company_name', 'purpose', 'manager_name', 'manager_entity', 'data'))
+INDEXED_MEMBER_FIELDS = frozenset(('name', 'entity_name'))
+
+
+class SearchUnavailable(RuntimeError):
+    pass
+
+
+class InvalidSearchQuery(ValueError):
+    pass
+
+
+def _data_keys():
+    return current_app.config.get('SEARCH_DATA_KEYS', DEFAULT_DATA_KEYS)
+
+
+def _flatten(value):
+    if isinstance(value, dict):
+        return ' '.join(_flatten(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return ' '.join(_flatten(v) for v in value)
+    return '' if value is None else str(value)
+
+
+def build_document(company_name, purpose, manager_name, manager_entity, data, member_names):
+    """Index text per column; member_names is an iterable of (name, entity_name)"""
+    data = data or {}
+    return {
+        'company_name': company_name or '',
+        'manager': ' '.join(filter(None, (manager_name, manager_entity))),
+        'members': ' '.join(part for pair in member_names for part in pair if part),
+        'purpose': purpose or _flatten(data.get('purpose')),
+        'data': ' '.join(_flatten(data[key]) for key in _data_keys() if key in data),
+    }
+
+
+def query_terms(query):
+    terms = re.findall(r'\w+', query or '')[:MAX_QUERY_TERMS]
+    if not terms:
+        raise InvalidSearchQuery('Search query needs at least one word')
+    return terms
+
+
+class _Fts5Index:
+    def create(self, connection):
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS agreement_search USING fts5("
+            f"{', '.join(INDEX_COLUMNS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+
+    def clear(self, connection):
+        connection.execute(text('DELETE FROM agreement_search'))
+
+    def upsert(self, connection, rows):
+        """rows: [(agreement_id, document)]"""
+        connection.execute(text('DELETE FROM agreement_search WHERE rowid = :id'), [{'id': i} for i, _ in rows])
+        connection.execute(
+            text(f"INSERT INTO agreement_search (rowid, {', '.join(INDEX_COLUMNS)}) "
+                 f"VALUES (:id, {', '.join(':' + c for c in INDEX_COLUMNS)})"),
+            [dict(document, id=agreement_id) for agreement_id, document in rows]
+        )
+
+    def search(self, connection, terms, limit, offset):
+        # Every term must match; the last one as a prefix so partial words find results
+        match = ' '.join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+        weights = ', '.join(str(COLUMN_WEIGHTS[c]) for c in INDEX_COLUMNS)
+        return connection.execute(text(
+            f"SELECT a.id, a.company_name, a.manager_name, a.state, a.updated_at, "
+            f"-bm25(agreement_search, {weights}) AS score, "
+            f"snippet(agreement_search, -1, '<mark>', '</mark>', '…', 12) AS snippet "
+            f"FROM agreement_search JOIN agreements a ON a.id = agreement_search.rowid "
+            f"WHERE agreement_search MATCH :match "
+            f"ORDER BY bm25(agreement_search, {weights}) LIMIT :limit OFFSET :offset"
+        ).columns(updated_at=DateTime), {'match': match.strip(), 'limit': limit, 'offset': offset}).mappings().all()
+
+
+class _PostgresIndex:
+    CONFIG = 'english'
+    WEIGHT_CLASSES = {'company_name': 'A', 'manager': 'B', 'members': 'B', 'purpose': 'C', 'data': 'D'}
+
+    def create(self, connection):
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS agreement_search ('
+            'agreement_id INTEGER PRIMARY KEY REFERENCES agreements (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        ))
+        connection.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_agreement_search_document ON agreement_search USING GIN (document)'
+        ))
+
+    def clear(self, connection):
+        connection.execute(text('TRUNCATE agreement_search'))
+
+    def upsert(self, connection, rows):
+        vector = ' || '.join(
+            f"setweight(to_tsvector('{self.CONFIG}', :{column}), '{self.WEIGHT_CLASSES[column]}')"
+            for column in INDEX_COLUMNS
+        )
+        connection.execute(
+            text(f'INSERT INTO agreement_search (agreement_id, document) VALUES (:id, {vector}) '
+                 f'ON CONFLICT (agreement_id) DO UPDATE SET document = EXCLUDED.document'),
+            [dict(document, id=agreement_id) for agreement_id, document in rows]
+        )
+
+    def search(self, connection, terms, limit, offset):
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        return connection.execute(text(
+            f"SELECT a.id, a.company_name, a.manager_name, a.state, a.updated_at, "
+            f"ts_rank_cd(s.document, q) AS score, NULL AS snippet "
+            f"FROM agreement_search s JOIN agreements a ON a.id = s.agreement_id, "
+            f"to_tsquery('{self.CONFIG}', :query) q "
+            f"WHERE s.document @@ q ORDER BY score DESC, a.id LIMIT :limit OFFSET :offset"
+        ).columns(updated_at=DateTime), {'query': tsquery, 'limit': limit, 'offset': offset}).mappings().all()
+
+
+_BACKENDS = {'sqlite': _Fts5Index(), 'postgresql': _PostgresIndex()}
+
+
+def _backend(connection):
+    backend = _BACKENDS.get(connection.dialect.name)
+    if backend is None:
+        raise SearchUnavailable(f'Full-text search is not supported on {connection.dialect.name}')
+    return backend
+
+
+def create_index():
+    """Create the search table if missing (create_all can't express it); run by `flask init-db`"""
+    connection = db.session.connection()
+    backend = _BACKENDS.get(connection.dialect.name)
+    if backend is not None:
+        backend.create(connection)
+
+
+def index_agreement(agreement):
+    """Rewrite one agreement's index row; call after flush so members are in the database"""
+    member_names = db.session.execute(
+        select(Member.name, Member.entity_name).where(Member.agreement_id == agreement.id)
+    ).all()
+    document = build_document(agreement.company_name, agreement.purpose, agreement.manager_name,
+                              agreement.manager_entity, agreement.data, member_names)
+    connection = db.session.connection()
+    backend = _BACKENDS.get(connection.dialect.name)
+    if backend is not None:
+        backend.upsert(connection, [(agreement.id, document)])
+
+
+def index_bulk(rows):
+    """Index newly inserted agreements: [(agreement_id, agreement values, member values)]"""
+    connection = db.session.connection()
+    backend = _BACKENDS.get(connection.dialect.name)
+    if backend is None or not rows:
+        return
+    documents = [
+        (agreement_id, build_document(
+            values.get('company_name'), values.get('purpose'), values.get('manager_name'),
+            values.get('manager_entity'), values.get('data'),
+            [(m.get('name'), m.get('entity_name')) for m in members]
+        ))
+        for agreement_id, values, members in rows
+    ]
+    backend.upsert(connection, documents)
+
+
+def affects_index(changed_fields=(), member_changes=(), members_added_or_removed=False):
+    """Whether an edit touched anything the index covers"""
+    return (
+        members_added_or_removed
+        or bool(INDEXED_FIELDS.intersection(changed_fields))
+        or any(INDEXED_MEMBER_FIELDS.intersection(attrs) for attrs in member_changes)
+    )
+
+
+def search(query, limit, offset=0):
+    terms = query_terms(query)
+    connection = db.session.connection()
+    return _backend(connection).search(connection, terms, limit, offset)
+
+
+def rebuild_index(batch_size=REBUILD_BATCH_SIZE):
+    """Drop and repopulate every index row, committing one batch at a time; returns the count"""
+    connection = db.session.connection()
+    backend = _backend(connection)
+    backend.create(connection)
+    backend.clear(connection)
+    db.session.commit()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        agreements = db.session.execute(
+            select(Agreement.id, Agreement.company_name, Agreement.purpose, Agreement.manager_name,
+                   Agreement.manager_entity, Agreement.data)
+            .where(Agreement.id > last_id).order_by(Agreement.id).limit(batch_size)
+        ).all()
+        if not agreements:
+            return indexed
+
+        names = {}
+        for agreement_id, name, entity_name in db.session.execute(
+            select(Member.agreement_id, Member.name, Member.entity_name)
+            .where(Member.agreement_id.in_([a.id for a in agreements]))
+        ):
+            names.setdefault(agreement_id, []).append((name, entity_name))
+
+        connection = db.session.connection()
+        backend.upsert(connection, [
+            (a.id, build_document(a.company_name, a.purpose, a.manager_name, a.manager_entity, a.data,
+                                  names.get(a.id, [])))
+            for a in agreements
+        ])
+        db.session.commit()
+        indexed += len(agreements)
+        last_id = agreements[-1].id
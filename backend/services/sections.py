@@ -0,0 +1,235 @@
+"""
+Section model for the from-scratch operating agreement.
+
+Each section declares the agreement fields it reads and builds a list of
+simple content blocks from just those values. Because a section can only
+see its declared inputs, its output can be cached by a hash of them.
+Sections that read the members are not cached: their inputs are unique to
+almost every agreement and their output grows with the member count.
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+
+# Content blocks
+Run = namedtuple('Run', 'text bold size', defaults=(False, None))
+Paragraph = namedtuple('Paragraph', 'runs style align', defaults=((), None, None))
+Heading = namedtuple('Heading', 'text level', defaults=(1,))
+Table = namedtuple('Table', 'headers rows style')
+PageBreak = namedtuple('PageBreak', '')
+
+MemberRow = namedtuple('MemberRow', 'name member_class capital_commitment')
+
+
+class _Missing:
+    """Marks a data key that is absent, as opposed to present with a null value"""
+
+    def __repr__(self):
+        return '<missing>'
+
+    __str__ = __repr__
+
+
+MISSING = _Missing()
+
+
+def para(text='', style=None, align=None):
+    return Paragraph((Run(text),) if text else (), style, align)
+
+
+def field_value(agreement, field):
+    """Resolve a declared input: a column name, 'data.<key>' or 'members'"""
+    if field == 'members':
+        return tuple(MemberRow(m.name, m.member_class, m.capital_commitment) for m in agreement.members)
+    if field.startswith('data.'):
+        return (agreement.data or {}).get(field[len('data.'):], MISSING)
+    return getattr(agreement, field)
+
+
+class Section:
+    def __init__(self, name, fields, build):
+        self.name = name
+        self.fields = tuple(fields)
+        self.build = build
+        self.cacheable = 'members' not in self.fields
+
+    def inputs(self, agreement):
+        return {field: field_value(agreement, field) for field in self.fields}
+
+    def cache_key(self, inputs):
+        payload = json.dumps([self.name, [inputs[f] for f in self.fields]], default=str, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _data(v, key, default):
+    value = v[f'data.{key}']
+    return default if value is MISSING else value
+
+
+def _long_date(value):
+    # Unsaved drafts (live preview) may not have their dates yet
+    return value.strftime('%d %B %Y') if value else '[date to be confirmed]'
+
+
+def _title_block(v):
+    manager = f"Manager: {v['manager_name']}" + (f" ({v['manager_entity']})" if v['manager_entity'] else '')
+    return [
+        Paragraph((
+            Run('LIMITED LIABILITY COMPANY AGREEMENT\nOF\n', bold=True, size=16),
+            Run(f"{v['company_name'].upper()}\n", bold=True, size=18),
+            Run(f"(a {v['state']} limited liability company)", size=12),
+        ), align='center'),
+        para(),
+        # Effective Date
+        para(f"Effective Date: {_long_date(v['effective_date'])}", align='center'),
+        para(),
+        # Key Information
+        para(manager),
+        para(f"Principal Place of Business: {v['principal_place_of_business'] or '[To be confirmed]'}"),
+        para(f"Registered Agent ({v['state'][:2].upper()}): {v['registered_agent'] or '[Insert name & address]'}"),
+        para(),
+    ]
+
+
+def _recitals(v):
+    recitals = [
+        f'{v["company_name"]} (the "Company") was formed on {_long_date(v["formation_date"])} by filing a Certificate of Formation with the {v["state"]} Secretary of State.',
+        'The Company has been organized to ' + (v['purpose'] or '[insert purpose]'),
+        'The parties desire to enter into this Agreement to govern their rights and obligations as members of the Company.'
+    ]
+    blocks = [Heading('Recitals')]
+    blocks.extend(para(f'{chr(65+i)}. {recital}') for i, recital in enumerate(recitals))
+    blocks.append(para())
+    blocks.append(para('NOW, THEREFORE, in consideration of the mutual covenants herein, the parties agree as follows:'))
+    return blocks
+
+
+def _article_1(v):
+    return [
+        Heading('ARTICLE I – Definitions & Construction'),
+        para('Key defined terms are set out in Schedule A. Where terms are not defined, they have the meaning given in the ' +
+             f"{v['state']} Limited Liability Company Act."),
+        para(),
+    ]
+
+
+def _article_2(v):
+    return [
+        Heading('ARTICLE II – Formation, Purpose, Term'),
+        para('2.1 Formation & Name.', style='Heading 2'),
+        para(f"The Company exists as a {v['state']} LLC under the name {v['company_name']} " +
+             'and may operate under trade or "doing-business-as" names approved by the Manager.'),
+        para('2.2 Purpose.', style='Heading 2'),
+        para("The Company's purpose is limited to: " + (v['purpose'] or '[insert purpose]')),
+        para('2.3 Term.', style='Heading 2'),
+        para('Perpetual, unless dissolved under Article X.'),
+        para(),
+    ]
+
+
+def _article_3(v):
+    class_rows = [
+        ['Class A', 'Anchor Units', _data(v, 'class_a_valuation', '£0.95m'),
+         _data(v, 'class_a_rights', '≥1 Board seat; veto over Reserved Matters')],
+        ['Class B', 'Investor Units', _data(v, 'class_b_valuation', '£3.25m'),
+         _data(v, 'class_b_rights', 'Standard voting; pro-rata pre-emptive rights')],
+        ['Class C', 'Sweat-Equity Units', 'N/A (services)',
+         _data(v, 'class_c_rights', 'Vesting schedules tied to KPIs')]
+    ]
+    blocks = [
+        Heading('ARTICLE III – Units, Capitalization & Classes'),
+        para('3.1 Authorized Units.', style='Heading 2'),
+        para('The Company is authorized to issue three classes of limited liability company interests (collectively, "Units"):'),
+        Table(('Class', 'Designation', 'Pre-Money Valuation', 'Rights Snapshot'), class_rows, 'Light List Accent 1'),
+        para(),
+        para('3.2 Initial Capital Commitments.', style='Heading 2'),
+    ]
+
+    if v['members']:
+        member_rows = [[
+            m.name,
+            m.member_class,
+            f"£{m.capital_commitment:,.0f}" if m.capital_commitment else 'Services',
+            'See Schedule C' if m.member_class == 'A' else 'Pro-rata calls'
+        ] for m in v['members']]
+        blocks.append(Table(('Member', 'Class', 'Commitment', 'Payment Terms'), member_rows, 'Light List Accent 1'))
+
+    blocks.append(para())
+    return blocks
+
+
+def _article_4(v):
+    return [
+        Heading('ARTICLE IV – Allocations & Tax'),
+        para('Standard tax provisions apply, with profits and losses allocated pro-rata to Percentage Interests.'),
+        para(),
+    ]
+
+
+def _article_5(v):
+    waterfall_items = [
+        'Transaction Costs & Liabilities.',
+        'Return of Capital. Repay Members pro-rata until all Capital Contributions returned.',
+        'Catch-Up / Carry. 20% to Manager until it has received 20% of total distributed amounts above return of capital.',
+        'Residual. 80% to all Members pro-rata by fully-diluted ownership; 20% to Manager (carry).'
+    ]
+    blocks = [
+        Heading('ARTICLE V – Distributions & Waterfall'),
+        para('5.1 Timing.', style='Heading 2'),
+        para('Distributions are at Manager discretion, subject to lender covenants and cash-flow needs.'),
+        para('5.2 Waterfall.', style='Heading 2'),
+        para('Distributable cash (including exit proceeds) is applied:'),
+    ]
+    blocks.extend(para(f'{i}. {item}', style='List Number') for i, item in enumerate(waterfall_items, 1))
+    blocks.append(para())
+    return blocks
+
+
+def _article_6(v):
+    reserved_matters = [
+        'Issuance of equity or options outside approved pools.',
+        'Incurrence of new secured debt above specified thresholds.',
+        'Sale or encumbrance of material assets.',
+        'Key personnel decisions.'
+    ]
+    blocks = [
+        Heading('ARTICLE VI – Governance'),
+        para('6.1 Manager Powers.', style='Heading 2'),
+        para(f"The Manager ({v['manager_name']}) has exclusive authority over operations, " +
+             'subject only to Reserved Matters.'),
+        para('6.2 Reserved Matters.', style='Heading 2'),
+        para('No action without requisite Member consent on:'),
+    ]
+    blocks.extend(para(f'• {matter}', style='List Bullet') for matter in reserved_matters)
+    blocks.append(para())
+    return blocks
+
+
+def _signature_page(v):
+    # Manager first, then every member
+    sig_rows = [[v['manager_name'], 'Manager', '_' * 30]]
+    sig_rows.extend([m.name, f'Member (Class {m.member_class})', '_' * 30] for m in v['members'])
+    return [
+        PageBreak(),
+        Heading('Signature Page'),
+        para('By signing below, each undersigned Person agrees to be bound by this ' +
+             f"Limited Liability Company Agreement of {v['company_name']} as of the Effective Date."),
+        para(),
+        Table(('Member / Manager', 'Capacity', 'Signature / Date'), sig_rows, 'Table Grid'),
+    ]
+
+
+SECTIONS = [
+    Section('title', ('company_name', 'state', 'effective_date', 'manager_name', 'manager_entity',
+                      'principal_place_of_business', 'registered_agent'), _title_block),
+    Section('recitals', ('company_name', 'formation_date', 'state', 'purpose'), _recitals),
+    Section('article_1', ('state',), _article_1),
+    Section('article_2', ('state', 'company_name', 'purpose'), _article_2),
+    Section('article_3', ('data.class_a_valuation', 'data.class_a_rights', 'data.class_b_valuation',
+                          'data.class_b_rights', 'data.class_c_rights', 'members'), _article_3),
+    Section('article_4', (), _article_4),
+    Section('article_5', (), _article_5),
+    Section('article_6', ('manager_name',), _article_6),
+    Section('signature_page', ('company_name', 'manager_name', 'members'), _signature_page),
+]
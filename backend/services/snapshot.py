@@ -0,0 +1,105 @@
+from datetime import date
+from numbers import Number
+from types import SimpleNamespace
+
+MEMBER_FIELDS = (
+    'id', 'name', 'entity_name', 'member_class', 'units', 'capital_commitment',
+    'percentage_interest', 'is_manager', 'address', 'email'
+)
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def member_to_dict(member):
+    return {field: getattr(member, field, None) for field in MEMBER_FIELDS}
+
+
+def agreement_to_dict(agreement):
+    """Plain, JSON-serialisable copy of everything a document is built from"""
+    return {
+        'id': agreement.id,
+        'company_name': agreement.company_name,
+        'state': agreement.state,
+        'formation_date': _isoformat(agreement.formation_date),
+        'effective_date': _isoformat(agreement.effective_date),
+        'manager_name': agreement.manager_name,
+        'manager_entity': agreement.manager_entity,
+        'principal_place_of_business': agreement.principal_place_of_business,
+        'registered_agent': agreement.registered_agent,
+        'purpose': agreement.purpose,
+        'data': agreement.data,
+        'members': [member_to_dict(m) for m in agreement.members]
+    }
+
+
+def _parse_date(value):
+    return date.fromisoformat(value[:10]) if value else None
+
+
+def agreement_from_dict(snapshot):
+    """Rebuild an attribute-style agreement the document generator can read.
+
+    Used where ORM objects can't travel, e.g. into worker processes.
+    """
+    fields = dict(snapshot)
+    fields['formation_date'] = _parse_date(fields.get('formation_date'))
+    fields['effective_date'] = _parse_date(fields.get('effective_date'))
+    fields['members'] = [SimpleNamespace(**m) for m in fields.get('members', [])]
+    return SimpleNamespace(**fields)
+
+
+# Member keys the documents format as numbers
+_NUMERIC_MEMBER_KEYS = ('units', 'capital_commitment', 'percentage_interest')
+
+
+def _payload_members(payload):
+    members = payload.get('members') or []
+    if not isinstance(members, list):
+        raise TypeError('members must be a list')
+    for index, member in enumerate(members):
+        if not isinstance(member, dict):
+            raise TypeError(f'members[{index}] must be an object')
+        for key in _NUMERIC_MEMBER_KEYS:
+            value = member.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, Number)):
+                raise TypeError(f'members[{index}].{key} must be a number')
+    return members
+
+
+def agreement_from_payload(payload):
+    """Attribute-style agreement from an unsaved POST /api/agreements style body.
+
+    Raises TypeError when the body or its members have the wrong shape.
+    """
+    if not isinstance(payload, dict):
+        raise TypeError('Request body must be a JSON object')
+    for key in ('formation_date', 'effective_date'):
+        if payload.get(key) is not None and not isinstance(payload[key], str):
+            raise TypeError(f'{key} must be an ISO date string')
+    return agreement_from_dict({
+        'id': payload.get('id'),
+        'company_name': payload.get('company_name') or '',
+        'state': payload.get('state') or 'Delaware',
+        'formation_date': payload.get('formation_date'),
+        'effective_date': payload.get('effective_date'),
+        'manager_name': payload.get('manager_name'),
+        'manager_entity': payload.get('manager_entity'),
+        'principal_place_of_business': payload.get('principal_place_of_business'),
+        'registered_agent': payload.get('registered_agent'),
+        'purpose': payload.get('purpose'),
+        'data': payload,
+        'members': [{
+            'id': m.get('id'),
+            'name': m.get('name'),
+            'entity_name': m.get('entity_name'),
+            'member_class': m.get('class'),
+            'units': m.get('units', 0),
+            'capital_commitment': m.get('capital_commitment', 0),
+            'percentage_interest': m.get('percentage_interest', 0),
+            'is_manager': m.get('is_manager', False),
+            'address': m.get('address'),
+            'email': m.get('email')
+        } for m in _payload_members(payload)]
+    })
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unicodedata
+import zipfile
+from urllib.parse import quote
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_SPOOL_THRESHOLD = 8 * 1024 * 1024
+DEFAULT_ROWS_PER_CHUNK = 500
+
+
+def spooled_buffer(max_size=DEFAULT_SPOOL_THRESHOLD):
+    """In-memory buffer that only moves to a self-deleting temp file above max_size"""
+    return tempfile.SpooledTemporaryFile(max_size=max_size, suffix='.docx')
+
+
+def buffer_size(fileobj):
+    position = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(position)
+    return size
+
+
+def iter_file(fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a file-like object in chunks and close it once exhausted"""
+    try:
+        fileobj.seek(0)
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def content_disposition(download_name, as_attachment=True):
+    """Content-Disposition value and parameters, with an ASCII fallback name"""
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(download_name, safe="!#$&+^`|~")
+        names = {'filename': simple, 'filename*': f"UTF-8''{quoted}"}
+    else:
+        names = {'filename': download_name}
+    return ('attachment' if as_attachment else 'inline'), names
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(columns, rows, rows_per_chunk=DEFAULT_ROWS_PER_CHUNK):
+    """Yield a header and then rows as CSV text, a batch of rows per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_value(v) for v in row])
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(columns, rows, rows_per_chunk=DEFAULT_ROWS_PER_CHUNK):
+    """Yield rows as one JSON object per line, a batch of rows per chunk"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), default=_json_default))
+        if len(lines) >= rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+class ChunkSink:
+    """Write-only stream that hands out whatever has been written since the last drain.
+
+    It has no seek/tell, so zipfile writes entries with data descriptors and
+    never needs to go back, which lets the archive be streamed.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_documents_zip(results, manifest):
+    """Yield a ZIP archive of documents as they arrive, then manifest.json.
+
+    ``results`` yields ``(entry, content)``: each entry dict is appended to
+    ``manifest['documents']`` and, when content is not None, the document is
+    stored under ``entry['filename']``. Documents are stored, not deflated,
+    since .docx files are compressed already.
+    """
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for entry, content in results:
+            if content is not None:
+                archive.writestr(entry['filename'], content)
+            manifest['documents'].append(entry)
+            yield sink.drain()
+
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+    yield sink.drain()
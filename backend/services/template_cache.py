@@ -0,0 +1,123 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+
+from jinja2 import Environment
+
+from .docx_packaging import TemplatePackage
+
+
+class _CompilingEnvironment(Environment):
+    """Jinja environment that keeps compiled templates for repeated sources.
+
+    docxtpl calls ``from_string`` with the patched XML of each part on every
+    render. The patched XML is identical for every render of the same
+    template, so the compiled template can be reused.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compiled = {}
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals is not None or template_class is not None:
+            return super().from_string(source, globals, template_class)
+
+        template = self._compiled.get(source)
+        if template is None:
+            template = super().from_string(source)
+            self._compiled[source] = template
+        return template
+
+
+class CompiledTemplate:
+    """A parsed .docx template that can be rendered many times"""
+
+    def __init__(self, name, path, signature):
+        self.name = name
+        self.path = path
+        self.signature = signature
+        self.jinja_env = _CompilingEnvironment()
+
+        from docxtpl import DocxTemplate
+        template = DocxTemplate(path)
+        template.init_docx()
+        self._docx = template.docx
+        # Compressed template members, reused for every part a render leaves unchanged
+        self.package = TemplatePackage.load(path, self._docx)
+
+    def clone(self):
+        """Return a fresh DocxTemplate backed by a copy of the parsed tree"""
+        from docxtpl import DocxTemplate
+        template = DocxTemplate(self.path)
+        template.docx = copy.deepcopy(self._docx)
+        return template
+
+    def render(self, context):
+        template = self.clone()
+        template.render(context, self.jinja_env)
+        return template
+
+
+class TemplateCache:
+    """Process-wide LRU cache of parsed templates keyed by template name.
+
+    Entries are invalidated when the file's mtime or size changes.
+    """
+
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def file_signature(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, name, path):
+        signature = self.file_signature(path)
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.path == path and entry.signature == signature:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Parse outside the lock so slow loads don't block other templates
+        entry = CompiledTemplate(name, path, signature)
+
+        with self._lock:
+            self._entries[name] = entry
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'templates': list(self._entries.keys())
+            }
+
+
+template_cache = TemplateCache(max_size=int(os.getenv('TEMPLATE_CACHE_SIZE', '16')))
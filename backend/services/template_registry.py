@@ -0,0 +1,205 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+
+from jinja2 import TemplateError
+
+from .document_generator import TEMPLATES_DIR
+from .template_cache import template_cache
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,100}$')
+
+
+class TemplateValidationError(ValueError):
+    pass
+
+
+class TemplateExistsError(Exception):
+    pass
+
+
+class TemplateInfo:
+    """Metadata computed once when a template file version is first seen"""
+
+    def __init__(self, name, path, content, mtime_ns, variables=None):
+        """``variables`` skips compiling the template again when they are already known"""
+        self.name = name
+        self.filename = os.path.basename(path)
+        self.path = path
+        self.size = len(content)
+        self.mtime_ns = mtime_ns
+        self.sha256 = hashlib.sha256(content).hexdigest()
+        if variables is None:
+            self.variables, self.error = _undeclared_variables(content)
+        else:
+            self.variables, self.error = set(variables), None
+
+    @property
+    def signature(self):
+        return (self.mtime_ns, self.size)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'filename': self.filename,
+            'size': self.size,
+            'sha256': self.sha256,
+            'modified': self.mtime_ns / 1e9,
+            'variables': sorted(self.variables),
+            'error': self.error
+        }
+
+
+def _undeclared_variables(content):
+    """Compile the template and return (variables it needs from the context, error)"""
+    from docxtpl import DocxTemplate
+    from lxml.etree import XMLSyntaxError
+
+    try:
+        template = DocxTemplate(io.BytesIO(content))
+        return set(template.get_undeclared_template_variables()), None
+    except (TemplateError, XMLSyntaxError, zipfile.BadZipFile, KeyError, ValueError) as exc:
+        return set(), f'{type(exc).__name__}: {exc}'
+
+
+def validate_template(content):
+    """Raise TemplateValidationError unless content is a .docx whose Jinja compiles"""
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            if 'word/document.xml' not in archive.namelist():
+                raise TemplateValidationError('Not a Word document: word/document.xml is missing')
+            bad_member = archive.testzip()
+            if bad_member:
+                raise TemplateValidationError(f'Corrupt archive member: {bad_member}')
+    except zipfile.BadZipFile as exc:
+        raise TemplateValidationError('Template must be a .docx file') from exc
+
+    variables, error = _undeclared_variables(content)
+    if error:
+        raise TemplateValidationError(f'Template does not compile: {error}')
+    return variables
+
+
+class TemplateRegistry:
+    """In-memory index of the templates directory.
+
+    ``refresh`` stats the directory at most once per ``scan_interval`` and
+    only re-reads files whose mtime or size changed.
+    """
+
+    def __init__(self, templates_dir, scan_interval=2.0):
+        self.templates_dir = templates_dir
+        self.scan_interval = scan_interval
+        self._templates = {}
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('TEMPLATE_SCAN_INTERVAL', self.scan_interval)
+        self.scan_interval = app.config['TEMPLATE_SCAN_INTERVAL']
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_scan < self.scan_interval:
+            return
+
+        # Changed files are compiled without holding the lock, so lookups
+        # keep being served from the previous index meanwhile
+        known = self._templates
+        templates = self._scan(known)
+        with self._lock:
+            if self._templates is not known:
+                # Keep whatever register() (or another scan) installed in the meantime
+                templates.update(
+                    (name, info) for name, info in self._templates.items() if known.get(name) is not info
+                )
+            self._templates = templates
+            self._last_scan = now
+
+    def _scan(self, known):
+        templates = {}
+        if not os.path.isdir(self.templates_dir):
+            return templates
+        for entry in os.scandir(self.templates_dir):
+            if not entry.name.endswith('.docx') or not entry.is_file():
+                continue
+            name = entry.name[:-len('.docx')]
+            stat = entry.stat()
+            info = known.get(name)
+            if info is not None and info.signature == (stat.st_mtime_ns, stat.st_size):
+                templates[name] = info
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    info = TemplateInfo(name, entry.path, f.read(), stat.st_mtime_ns)
+            except Exception:
+                # One unreadable file mustn't take every other template down with it
+                logger.exception('Skipping template %s', entry.path)
+                continue
+            if info.error:
+                logger.warning('Template %s does not compile: %s', entry.path, info.error)
+            templates[name] = info
+        return templates
+
+    def list(self):
+        self.refresh()
+        return sorted(self._templates.values(), key=lambda t: t.name)
+
+    def get(self, name):
+        self.refresh()
+        return self._templates.get(name)
+
+    def register(self, name, content, overwrite=False):
+        """Validate, compile and atomically install an uploaded template.
+
+        Raises TemplateExistsError if the name is taken, unless ``overwrite``.
+        """
+        if not TEMPLATE_NAME_PATTERN.match(name or ''):
+            raise TemplateValidationError('Template names may only contain letters, digits, "-" and "_"')
+        variables = validate_template(content)
+
+        os.makedirs(self.templates_dir, exist_ok=True)
+        path = os.path.join(self.templates_dir, f'{name}.docx')
+        fd, tmp_path = tempfile.mkstemp(dir=self.templates_dir, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            stat = os.stat(tmp_path)
+            info = TemplateInfo(name, path, content, stat.st_mtime_ns, variables)
+            with self._lock:
+                if overwrite:
+                    os.replace(tmp_path, path)
+                else:
+                    # link() fails if the name exists, even if another process just created it
+                    try:
+                        os.link(tmp_path, path)
+                    except FileExistsError:
+                        raise TemplateExistsError(f"Template '{name}' already exists") from None
+                self._templates = {**self._templates, name: info}
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        template_cache.invalidate(name)
+        return info
+
+    def warm(self):
+        """Parse every valid template into the template cache; returns their names"""
+        self.refresh(force=True)
+        warmed = []
+        for info in self.list():
+            if info.error is None:
+                template_cache.get(info.name, info.path)
+                warmed.append(info.name)
+        return warmed
+
+
+template_registry = TemplateRegistry(TEMPLATES_DIR)
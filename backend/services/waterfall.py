@@ -0,0 +1,217 @@
+"""
+Distribution waterfall from Article V, evaluated with NumPy over a grid of
+exit values and holding periods.
+
+Tiers, applied to net proceeds in each scenario:
+  1. Return of capital, pro rata by capital commitment.
+  2. Preferred return on that capital, compounded annually over the holding
+     period, pro rata by capital commitment.
+  3. Manager catch-up until the manager holds ``carry`` of everything paid
+     above return of capital.
+  4. Residual: ``carry`` to the manager, the rest to members pro rata by
+     fully-diluted ownership (units over total units, as in the cap table).
+
+Member payouts are a linear combination of two per-scenario amounts (tiers
+1+2 by capital share, tier 4 by ownership share), so the full
+scenario-by-member matrix is a single (S, 2) @ (2, M) product and never has
+to exist in memory all at once.
+"""
+
+import numpy as np
+
+SCENARIO_CHUNK = 4096
+
+
+class WaterfallInputError(ValueError):
+    pass
+
+
+def scenario_grid(exit_values, years):
+    """Flatten every (exit value, holding period) pair into two aligned arrays"""
+    exit_values = np.asarray(exit_values, dtype=np.float64).ravel()
+    years = np.asarray(years, dtype=np.float64).ravel()
+    if exit_values.size == 0 or years.size == 0:
+        raise WaterfallInputError('At least one exit value and one holding period are required')
+    if np.any(years < 0):
+        raise WaterfallInputError('Holding periods cannot be negative')
+    grid_exit, grid_years = np.meshgrid(exit_values, years, indexing='ij')
+    return grid_exit.ravel(), grid_years.ravel()
+
+
+def member_shares(capital, units):
+    """Capital shares (tiers 1-2) and fully-diluted ownership shares (tier 4).
+
+    Ownership is units over total units, the basis of the cap table's
+    fully_diluted_ownership; only when no member holds units does it fall
+    back to capital.
+    """
+    capital = np.asarray(capital, dtype=np.float64)
+    total_capital = capital.sum()
+    capital_share = capital / total_capital if total_capital > 0 else np.zeros_like(capital)
+
+    for weights in (units, capital):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.sum() > 0:
+            return capital_share, weights / weights.sum()
+    return capital_share, np.zeros_like(capital)
+
+
+class WaterfallResult:
+    def __init__(self, exit_values, years, tiers, member_weights, capital):
+        self.exit_values = exit_values
+        self.years = years
+        self.tiers = tiers
+        self.member_weights = member_weights  # (2, M)
+        self.capital = capital
+        self._member_basis = np.stack([
+            tiers['return_of_capital'] + tiers['preferred_return'],
+            tiers['residual_members']
+        ], axis=1)  # (S, 2)
+
+    @property
+    def scenario_count(self):
+        return self.exit_values.size
+
+    @property
+    def member_count(self):
+        return self.member_weights.shape[1]
+
+    def member_distributions(self, start=0, stop=None):
+        """(scenarios, members) payouts for scenarios[start:stop]"""
+        return self._member_basis[start:stop] @ self.member_weights
+
+    def member_summary(self):
+        """Per-member mean, min and max payout across all scenarios, computed in chunks"""
+        mean = self._member_basis.mean(axis=0) @ self.member_weights
+        minimum = np.full(self.member_count, np.inf)
+        maximum = np.full(self.member_count, -np.inf)
+        for start in range(0, self.scenario_count, SCENARIO_CHUNK):
+            chunk = self.member_distributions(start, start + SCENARIO_CHUNK)
+            np.minimum(minimum, chunk.min(axis=0), out=minimum)
+            np.maximum(maximum, chunk.max(axis=0), out=maximum)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_multiple = np.where(self.capital > 0, mean / self.capital, np.nan)
+        return {'mean': mean, 'min': minimum, 'max': maximum, 'mean_multiple': mean_multiple}
+
+
+def run_waterfall(capital, units, exit_values, years,
+                  carry=0.20, preferred_return=0.0, cost_rate=0.0, fixed_costs=0.0):
+    if not 0 <= carry < 1:
+        raise WaterfallInputError('Carry must be at least 0% and below 100%')
+    if preferred_return < 0 or cost_rate < 0 or fixed_costs < 0:
+        raise WaterfallInputError('Preferred return and costs cannot be negative')
+
+    capital = np.asarray(capital, dtype=np.float64)
+    capital_share, ownership_share = member_shares(capital, units)
+    total_capital = capital.sum()
+
+    exit_grid, years_grid = scenario_grid(exit_values, years)
+
+    # 0. Transaction costs & liabilities
+    net = np.maximum(exit_grid * (1 - cost_rate) - fixed_costs, 0.0)
+    # 1. Return of capital
+    return_of_capital = np.minimum(net, total_capital)
+    remaining = net - return_of_capital
+    # 2. Preferred return, compounded over the holding period
+    preferred = np.minimum(remaining, total_capital * ((1 + preferred_return) ** years_grid - 1))
+    remaining -= preferred
+    # 3. Catch-up: manager takes everything until it has carry of tiers 2-3
+    catch_up = np.minimum(remaining, preferred * carry / (1 - carry))
+    remaining -= catch_up
+    # 4. Residual split
+    residual_manager = remaining * carry
+    residual_members = remaining - residual_manager
+
+    tiers = {
+        'net_proceeds': net,
+        'return_of_capital': return_of_capital,
+        'preferred_return': preferred,
+        'catch_up': catch_up,
+        'residual_members': residual_members,
+        'residual_manager': residual_manager,
+        'manager_total': catch_up + residual_manager,
+        'members_total': return_of_capital + preferred + residual_members,
+    }
+    return WaterfallResult(exit_grid, years_grid, tiers, np.stack([capital_share, ownership_share]), capital)
+
+
+def run_agreement_waterfall(agreement, exit_values, years, cost_rate=0.0, fixed_costs=0.0,
+                            carry_percentage=None, preferred_return=None):
+    """Waterfall for an agreement's members, using its CapitalStructure terms unless overridden"""
+    structure = agreement.capital_structure
+    if carry_percentage is None:
+        carry_percentage = structure.carry_percentage if structure and structure.carry_percentage is not None else 20
+    if preferred_return is None:
+        preferred_return = structure.preferred_return if structure and structure.preferred_return is not None else 0
+
+    members = agreement.members
+    if not members:
+        raise WaterfallInputError('Agreement has no members')
+
+    return run_waterfall(
+        capital=[m.capital_commitment or 0 for m in members],
+        units=[m.units or 0 for m in members],
+        exit_values=exit_values,
+        years=years,
+        carry=carry_percentage / 100,
+        preferred_return=preferred_return / 100,
+        cost_rate=cost_rate,
+        fixed_costs=fixed_costs,
+    )
+
+
+def parse_range(value, name, limit):
+    """A list of numbers, a single number, or {"start", "stop", "num"} for an evenly spaced range"""
+    if isinstance(value, dict):
+        try:
+            num = int(value.get('num', 50))
+            start, stop = float(value['start']), float(value['stop'])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise WaterfallInputError(f'{name} range needs numeric start, stop and num') from exc
+        if not 1 <= num <= limit:
+            raise WaterfallInputError(f'{name} range needs 1 <= num <= {limit}')
+        return np.linspace(start, stop, num)
+    if not isinstance(value, list):
+        value = [value]
+    if len(value) > limit:
+        raise WaterfallInputError(f'{name} is limited to {limit} values')
+    try:
+        values = np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError) as exc:
+        raise WaterfallInputError(f'{name} must be numbers') from exc
+    if not np.all(np.isfinite(values)):
+        raise WaterfallInputError(f'{name} must be finite numbers')
+    return values
+
+
+def parse_number(value, name):
+    """A single finite JSON number (or numeric string)"""
+    if isinstance(value, bool):
+        raise WaterfallInputError(f'{name} must be a number')
+    try:
+        number = float(value)
+    except (TypeError, ValueError) as exc:
+        raise WaterfallInputError(f'{name} must be a number') from exc
+    if not np.isfinite(number):
+        raise WaterfallInputError(f'{name} must be a finite number')
+    return number
+
+
+def parse_costs(value):
+    """transaction_costs: {"rate": fraction of exit value, "fixed": amount}, both optional"""
+    if value is None:
+        return 0.0, 0.0
+    if not isinstance(value, dict):
+        raise WaterfallInputError('transaction_costs must be an object')
+    return (parse_number(value.get('rate', 0), 'transaction_costs.rate'),
+            parse_number(value.get('fixed', 0), 'transaction_costs.fixed'))
+
+
+def to_json_list(values, decimals=2):
+    """Rounded floats with NaN/inf as None, since JSON has no representation for them"""
+    rounded = np.round(np.asarray(values, dtype=np.float64), decimals)
+    finite = np.isfinite(rounded)
+    if finite.all():
+        return rounded.tolist()
+    return np.where(finite, rounded, None).tolist()
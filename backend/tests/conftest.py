@@ -0,0 +1,47 @@
+import pytest
+
+from app import create_app
+from models import db
+from services.search import create_index
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'JOB_WORKERS': 0,
+        'QUERY_BUDGET_MODE': 'strict',
+    })
+    with app.app_context():
+        db.create_all()
+        create_index()
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_agreement(client):
+    """POST an agreement and return its JSON; keyword arguments override the body"""
+    def make(**fields):
+        body = {
+            'company_name': 'Acme Holdings',
+            'formation_date': '2024-01-01',
+            'effective_date': '2024-01-02',
+            'manager_name': 'Acme Manager',
+            'members': [
+                {'name': 'Alice', 'class': 'A', 'units': 60, 'capital_commitment': 600},
+                {'name': 'Bob', 'class': 'B', 'units': 40, 'capital_commitment': 400},
+            ],
+        }
+        body.update(fields)
+        response = client.post('/api/agreements', json=body)
+        assert response.status_code == 201, response.get_data(as_text=True)
+        return client.get(f"/api/agreements/{response.json['id']}").json
+    return make
@@ -0,0 +1,67 @@
+import json
+
+from sqlalchemy.exc import IntegrityError
+
+from models import Agreement, Member
+from services import bulk_import
+from services.bulk_import import import_ndjson
+
+
+def _record(name, **fields):
+    record = {
+        'company_name': name,
+        'formation_date': '2024-01-01',
+        'effective_date': '2024-01-02',
+        'manager_name': 'Manager',
+        'members': [{'name': f'{name} member', 'class': 'A', 'units': 10, 'capital_commitment': 100}],
+    }
+    record.update(fields)
+    return json.dumps(record)
+
+
+def test_import_reports_every_line(app):
+    lines = [
+        _record('One'),
+        '',
+        '{not json',
+        _record('Two', formation_date='yesterday'),
+        _record('Three', members=[{'name': 'No class'}]),
+        _record('Four'),
+    ]
+    # Invalid lines are reported at once, valid ones when their chunk is flushed
+    report = sorted(import_ndjson(lines, chunk_size=2), key=lambda entry: entry['line'])
+
+    assert [(entry['line'], entry['status']) for entry in report] == [
+        (1, 'created'), (3, 'error'), (4, 'error'), (5, 'error'), (6, 'created')
+    ]
+    assert report[2]['errors'] == ["Invalid date for formation_date: 'yesterday'"]
+    assert report[3]['errors'] == ['members[0] missing required field: class']
+    assert sorted(a.company_name for a in Agreement.query) == ['Four', 'One']
+    assert Member.query.count() == 2
+
+
+def test_failed_chunk_is_retried_one_record_at_a_time(app, monkeypatch):
+    insert_chunk = bulk_import._insert_chunk
+
+    def failing_insert(records):
+        if any(values['company_name'] == 'Broken' for _, values, _ in records):
+            raise IntegrityError('INSERT', {}, Exception('constraint failed'))
+        return insert_chunk(records)
+    monkeypatch.setattr(bulk_import, '_insert_chunk', failing_insert)
+
+    report = list(import_ndjson([_record('One'), _record('Broken'), _record('Three')], chunk_size=10))
+
+    assert [entry['status'] for entry in report] == ['created', 'error', 'created']
+    assert report[1] == {'line': 2, 'status': 'error', 'errors': ['constraint failed']}
+    assert sorted(a.company_name for a in Agreement.query) == ['One', 'Three']
+
+
+def test_imported_agreements_read_back_through_the_api(client):
+    response = client.post('/api/agreements/import?chunk_size=1', data='\n'.join([_record('One'), '[]']))
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert lines[-1] == {'summary': {'created': 1, 'failed': 1}}
+    agreement = client.get(f"/api/agreements/{lines[0]['id']}").json
+    assert agreement['members'][0]['name'] == 'One member'
+    cap_table = client.get(f"/api/agreements/{lines[0]['id']}/cap-table").json
+    assert cap_table['classes'][0]['units'] == 10
@@ -0,0 +1,84 @@
+import pytest
+
+from models import db, Agreement, CapTableEntry, Member
+from services.cap_table import check_cap_tables
+
+
+@pytest.fixture
+def agreement(make_agreement):
+    return make_agreement(members=[
+        {'name': 'Alice', 'class': 'A', 'units': 60, 'capital_commitment': 600, 'percentage_interest': 50},
+        {'name': 'Bob', 'class': 'A', 'units': 20, 'capital_commitment': 200, 'percentage_interest': 25},
+        {'name': 'Carol', 'class': 'B', 'units': 20, 'capital_commitment': 100, 'percentage_interest': 25},
+    ])
+
+
+def _classes(client, agreement):
+    cap_table = client.get(f"/api/agreements/{agreement['id']}/cap-table").json
+    return {row['class']: (row['member_count'], row['units'], row['capital_commitment']) for row in cap_table['classes']}
+
+
+def _patch_members(client, agreement, **diff):
+    version = client.get(f"/api/agreements/{agreement['id']}").json['version']
+    response = client.patch(f"/api/agreements/{agreement['id']}", json={'version': version, 'members': diff})
+    assert response.status_code == 200, response.json
+
+
+def _member_id(agreement, name):
+    return next(m['id'] for m in agreement['members'] if m['name'] == name)
+
+
+def test_totals_and_shares_on_create(client, agreement):
+    cap_table = client.get(f"/api/agreements/{agreement['id']}/cap-table").json
+    assert cap_table['totals'] == {'member_count': 3, 'units': 100, 'capital_commitment': 900, 'percentage_interest': 100}
+    class_a, class_b = cap_table['classes']
+    assert (class_a['class'], class_a['fully_diluted_ownership'], class_a['commitment_share']) == ('A', 0.8, 800 / 900)
+    assert (class_b['class'], class_b['fully_diluted_ownership']) == ('B', 0.2)
+
+
+def test_member_edits_apply_deltas(client, agreement):
+    _patch_members(client, agreement, update=[{'id': _member_id(agreement, 'Alice'), 'units': 70}])
+    assert _classes(client, agreement) == {'A': (2, 90, 800), 'B': (1, 20, 100)}
+
+    # Moving between classes takes the member out of one row and into the other
+    _patch_members(client, agreement, update=[{'id': _member_id(agreement, 'Bob'), 'class': 'B', 'capital_commitment': 250}])
+    assert _classes(client, agreement) == {'A': (1, 70, 600), 'B': (2, 40, 350)}
+
+    _patch_members(client, agreement, add=[{'name': 'Dan', 'class': 'C', 'units': 5}])
+    assert _classes(client, agreement)['C'] == (1, 5, 0)
+
+    # A class left without members drops out of the table
+    _patch_members(client, agreement, remove=[_member_id(agreement, 'Alice')])
+    assert set(_classes(client, agreement)) == {'B', 'C'}
+
+    assert check_cap_tables() == []
+
+
+def test_deleting_the_agreement_empties_its_cap_table(agreement):
+    db.session.delete(db.session.get(Agreement, agreement['id']))
+    db.session.commit()
+    assert CapTableEntry.query.filter_by(agreement_id=agreement['id']).count() == 0
+
+
+def test_unclassed_members_share_a_row(app, agreement):
+    for name in ('Eve', 'Frank'):
+        db.session.add(Member(agreement_id=agreement['id'], name=name, member_class=None, units=1))
+    db.session.commit()
+    entry = CapTableEntry.query.filter_by(agreement_id=agreement['id'], member_class='').one()
+    assert (entry.member_count, entry.units) == (2, 2)
+    assert check_cap_tables() == []
+
+
+def test_check_reports_and_repairs_drift(app, agreement):
+    entry = CapTableEntry.query.filter_by(agreement_id=agreement['id'], member_class='B').one()
+    entry.units = 999
+    db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['check-cap-tables'])
+    assert result.exit_code == 1
+
+    mismatches = check_cap_tables(repair=True)
+    assert [(m['class'], m['stored']['units'], m['expected']['units']) for m in mismatches] == [('B', 999, 20)]
+    assert check_cap_tables() == []
+    assert runner.invoke(args=['check-cap-tables']).exit_code == 0
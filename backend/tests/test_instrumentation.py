@@ -0,0 +1,53 @@
+import pytest
+
+from app import create_app
+from models import db
+from services.instrumentation import Histogram
+from services.query_counter import QueryBudgetExceeded, query_budget
+
+
+def test_budget_counts_queries_with_instrumentation_disabled(tmp_path):
+    # The budget relies on the instrumentation's engine listeners even without its request hooks
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "budget.db"}',
+        'JOB_WORKERS': 0,
+        'QUERY_BUDGET_MODE': 'strict',
+        'INSTRUMENTATION_ENABLED': False,
+    })
+
+    @query_budget(1)
+    def two_queries():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.execute(db.text('SELECT 2'))
+
+    with app.app_context():
+        with pytest.raises(QueryBudgetExceeded, match='issued 2 queries'):
+            two_queries()
+    assert 'Server-Timing' not in app.test_client().get('/health').headers
+
+
+def test_server_timing_reports_queries(client, make_agreement):
+    agreement = make_agreement()
+    timing = client.get(f"/api/agreements/{agreement['id']}").headers['Server-Timing']
+    entries = dict(entry.split(';', 1) for entry in timing.split(', '))
+    assert entries['queries'] != 'desc="0 queries"'
+    assert 'db' in entries and 'app' in entries
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('test_seconds', 'Test', ('endpoint',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(('/x',), value)
+    lines = histogram.render().splitlines()
+    assert 'test_seconds_bucket{endpoint="/x",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{endpoint="/x",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{endpoint="/x",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{endpoint="/x"} 3' in lines
+
+
+def test_metrics_endpoint(client):
+    # Metrics are recorded once the response is closed
+    client.get('/health').close()
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'opag_http_request_duration_seconds_count{method="GET",endpoint="/health",status="200"}' in body
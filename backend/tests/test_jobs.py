@@ -0,0 +1,118 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, GenerationJob
+from services.document_generator import DocumentGenerator
+from services.jobs import job_queue, QueueFullError
+
+
+@pytest.fixture
+def agreement_id(make_agreement):
+    return make_agreement()['id']
+
+
+def test_enqueue_refuses_jobs_beyond_max_depth(app, agreement_id):
+    app.config['JOB_QUEUE_MAX_DEPTH'] = 2
+    job_queue.enqueue(agreement_id)
+    job_queue.enqueue(agreement_id)
+    with pytest.raises(QueueFullError):
+        job_queue.enqueue(agreement_id)
+
+
+def test_claim_next_takes_oldest_due_job_once(agreement_id):
+    first = job_queue.enqueue(agreement_id).id
+    second = job_queue.enqueue(agreement_id).id
+    later = job_queue.enqueue(agreement_id)
+    later.run_after = datetime.utcnow() + timedelta(hours=1)
+    db.session.commit()
+
+    assert job_queue._claim_next() == first
+    assert job_queue._claim_next() == second
+    assert job_queue._claim_next() is None
+
+    job = db.session.get(GenerationJob, first)
+    assert (job.status, job.attempts) == ('running', 1)
+
+
+def test_claim_skips_job_claimed_by_another_worker(agreement_id):
+    job_id = job_queue.enqueue(agreement_id).id
+    db.session.execute(db.update(GenerationJob).where(GenerationJob.id == job_id).values(status='running'))
+    db.session.commit()
+    assert job_queue._claim_next() is None
+
+
+def test_run_stores_result(monkeypatch, agreement_id):
+    monkeypatch.setattr(DocumentGenerator, 'generate_to_buffer', lambda self, agreement, template: io.BytesIO(b'docx'))
+    job_id = job_queue.enqueue(agreement_id).id
+    job_queue._run(job_queue._claim_next())
+
+    job = db.session.get(GenerationJob, job_id)
+    assert job.status == 'succeeded'
+    assert (job.result, job.result_size) == (b'docx', 4)
+
+
+def test_failed_run_is_retried_with_backoff_then_fails(app, monkeypatch, agreement_id):
+    def fail(self, agreement, template):
+        raise RuntimeError('render failed')
+    monkeypatch.setattr(DocumentGenerator, 'generate_to_buffer', fail)
+    app.config['JOB_MAX_ATTEMPTS'] = 2
+    job_id = job_queue.enqueue(agreement_id).id
+
+    job_queue._run(job_queue._claim_next())
+    job = db.session.get(GenerationJob, job_id)
+    assert job.status == 'queued'
+    assert job.run_after > datetime.utcnow()
+    assert job.error == 'RuntimeError: render failed'
+
+    job.run_after = datetime.utcnow()
+    db.session.commit()
+    job_queue._run(job_queue._claim_next())
+    job = db.session.get(GenerationJob, job_id)
+    assert (job.status, job.attempts) == ('failed', 2)
+    assert job.finished_at is not None
+
+
+def test_recover_stale_requeues_or_fails_by_attempts(app, agreement_id):
+    long_ago = datetime.utcnow() - timedelta(seconds=app.config['JOB_LEASE_SECONDS'] + 60)
+    retry = GenerationJob(agreement_id=agreement_id, template='default', status='running',
+                          attempts=1, max_attempts=3, started_at=long_ago)
+    exhausted = GenerationJob(agreement_id=agreement_id, template='default', status='running',
+                              attempts=3, max_attempts=3, started_at=long_ago)
+    fresh = GenerationJob(agreement_id=agreement_id, template='default', status='running',
+                          attempts=3, max_attempts=3, started_at=datetime.utcnow())
+    db.session.add_all([retry, exhausted, fresh])
+    db.session.commit()
+
+    job_queue.recover_stale()
+
+    assert db.session.get(GenerationJob, retry.id).status == 'queued'
+    assert db.session.get(GenerationJob, exhausted.id).status == 'failed'
+    assert db.session.get(GenerationJob, fresh.id).status == 'running'
+
+
+def test_purge_finished_deletes_only_expired_finished_jobs(app, agreement_id):
+    expired = datetime.utcnow() - timedelta(seconds=app.config['JOB_RESULT_TTL'] + 60)
+    jobs = [
+        GenerationJob(agreement_id=agreement_id, template='default', status='succeeded', result=b'x', finished_at=expired),
+        GenerationJob(agreement_id=agreement_id, template='default', status='failed', finished_at=expired),
+        GenerationJob(agreement_id=agreement_id, template='default', status='succeeded', finished_at=datetime.utcnow()),
+        GenerationJob(agreement_id=agreement_id, template='default', status='queued'),
+    ]
+    db.session.add_all(jobs)
+    db.session.commit()
+
+    assert job_queue.purge_finished() == 2
+    assert sorted(job.status for job in GenerationJob.query) == ['queued', 'succeeded']
+    assert job_queue.purge_finished(ttl=0) == 0
+
+
+def test_job_endpoints(client, agreement_id):
+    response = client.post('/api/jobs', json={'agreement_id': agreement_id})
+    assert response.status_code == 202
+    job_id = response.json['job_id']
+
+    assert client.get(f'/api/jobs/{job_id}').json['status'] == 'queued'
+    assert client.get(f'/api/jobs/{job_id}/result').status_code == 409
+    assert client.get('/api/jobs/missing').status_code == 404
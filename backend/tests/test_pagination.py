@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+
+from models import db, Agreement
+from services.pagination import InvalidCursor, decode_cursor, encode_cursor, page_size, MAX_PAGE_SIZE
+
+
+def test_cursor_round_trip():
+    updated_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(updated_at, 42)) == (updated_at, 42)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not-base64!', encode_cursor(datetime(2024, 1, 1), 1)[:-3], 'WzFd'])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_page_size_is_clamped():
+    assert page_size(None) == page_size(0) == 50
+    assert page_size(10) == 10
+    assert page_size(MAX_PAGE_SIZE + 1) == MAX_PAGE_SIZE
+
+
+def _walk(client, url):
+    """Follow X-Next-Cursor through every page, returning the ids and page count"""
+    ids, pages = [], 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids.extend(row['id'] for row in response.json)
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'{url.split("&cursor=")[0]}&cursor={cursor}' if cursor else None
+    return ids, pages
+
+
+def test_pages_cover_every_row_once_across_timestamp_ties(client, make_agreement):
+    ids = [make_agreement(company_name=f'Company {i}')['id'] for i in range(7)]
+    # Several rows share an updated_at, so the id tiebreaker decides the order
+    db.session.execute(db.update(Agreement).where(Agreement.id.in_(ids[:4])).values(updated_at=datetime(2024, 1, 1)))
+    db.session.commit()
+
+    seen, pages = _walk(client, '/api/agreements?limit=2')
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(set(seen))
+    assert pages == 4
+    assert seen[-4:] == sorted(ids[:4], reverse=True)
+
+
+def test_next_link_keeps_filters(client, make_agreement):
+    for i in range(3):
+        make_agreement(company_name=f'Nevada {i}', state='Nevada')
+    make_agreement(state='Delaware')
+
+    response = client.get('/api/agreements?state=Nevada&limit=2')
+    assert len(response.json) == 2
+    assert 'state=Nevada' in response.headers['Link']
+
+    seen, _ = _walk(client, '/api/agreements?state=Nevada&limit=2')
+    assert len(seen) == 3
+
+
+def test_invalid_cursor_returns_400(client):
+    assert client.get('/api/agreements?cursor=garbage').status_code == 400
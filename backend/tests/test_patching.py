@@ -0,0 +1,140 @@
+import pytest
+
+from services.patching import PatchError, agreement_field_values, merge_patch, validate_member_diff
+
+
+@pytest.mark.parametrize('target, patch, expected', [
+    # RFC 7386 appendix A
+    ({'a': 'b'}, {'a': 'c'}, {'a': 'c'}),
+    ({'a': 'b'}, {'b': 'c'}, {'a': 'b', 'b': 'c'}),
+    ({'a': 'b'}, {'a': None}, {}),
+    ({'a': 'b', 'b': 'c'}, {'a': None}, {'b': 'c'}),
+    ({'a': ['b']}, {'a': 'c'}, {'a': 'c'}),
+    ({'a': 'c'}, {'a': ['b']}, {'a': ['b']}),
+    ({'a': {'b': 'c'}}, {'a': {'b': 'd', 'c': None}}, {'a': {'b': 'd'}}),
+    ({'a': [{'b': 'c'}]}, {'a': [1]}, {'a': [1]}),
+    (['a', 'b'], ['c', 'd'], ['c', 'd']),
+    ({'a': 'b'}, ['c'], ['c']),
+    ({'e': None}, {'a': 1}, {'e': None, 'a': 1}),
+    ([1, 2], {'a': 'b', 'c': None}, {'a': 'b'}),
+    ({}, {'a': {'bb': {'ccc': None}}}, {'a': {'bb': {}}}),
+])
+def test_merge_patch(target, patch, expected):
+    assert merge_patch(target, patch) == expected
+
+
+def test_merge_patch_leaves_target_unchanged():
+    target = {'a': {'b': 1}}
+    merge_patch(target, {'a': {'b': 2}})
+    assert target == {'a': {'b': 1}}
+
+
+@pytest.mark.parametrize('fields, error', [
+    ({'version': 3}, 'Field cannot be patched: version'),
+    ({'company_name': None}, 'company_name cannot be empty'),
+    ({'state': ''}, 'state cannot be empty'),
+    ({'company_name': 5}, 'Invalid value for company_name: must be a string'),
+    ({'formation_date': 'soon'}, 'Invalid value for formation_date'),
+])
+def test_agreement_field_errors(fields, error):
+    with pytest.raises(PatchError, match=error):
+        agreement_field_values(fields)
+
+
+def test_optional_fields_can_be_cleared():
+    assert agreement_field_values({'purpose': None, 'manager_entity': ''}) == {'purpose': None, 'manager_entity': None}
+
+
+@pytest.mark.parametrize('diff', [
+    [],
+    {'replace': []},
+    {'add': {}},
+    {'add': ['x']},
+    {'update': [{'name': 'No id'}]},
+    {'remove': [True]},
+])
+def test_invalid_member_diffs(diff):
+    with pytest.raises(PatchError):
+        validate_member_diff(diff)
+
+
+@pytest.fixture
+def agreement(make_agreement):
+    return make_agreement(data_key='kept')
+
+
+def _patch(client, agreement, body, **kwargs):
+    return client.patch(f"/api/agreements/{agreement['id']}", json=body, **kwargs)
+
+
+def test_patch_requires_a_version(client, agreement):
+    assert _patch(client, agreement, {'fields': {'purpose': 'x'}}).status_code == 428
+
+
+def test_stale_version_is_rejected(client, agreement):
+    body = {'version': agreement['version'], 'fields': {'manager_name': 'First'}}
+    first = _patch(client, agreement, body)
+    assert first.status_code == 200
+    assert first.json['version'] == agreement['version'] + 1
+    assert first.headers['ETag'] == f'"{agreement["version"] + 1}"'
+
+    second = _patch(client, agreement, {'version': agreement['version'], 'fields': {'manager_name': 'Second'}})
+    assert second.status_code == 409
+    assert second.json['version'] == agreement['version'] + 1
+
+    stale_header = _patch(client, agreement, {'fields': {'manager_name': 'Third'}},
+                          headers={'If-Match': f'"{agreement["version"]}"'})
+    assert stale_header.status_code == 409
+    assert client.get(f"/api/agreements/{agreement['id']}").json['manager_name'] == 'First'
+
+
+def test_patch_merges_data_and_applies_member_diff(client, agreement):
+    alice, bob = agreement['members']
+    response = _patch(client, agreement, {
+        'version': agreement['version'],
+        'fields': {'manager_name': 'New Manager'},
+        'data': {'data_key': None, 'notes': {'tax': 'partnership'}},
+        'members': {
+            'add': [{'name': 'Carol', 'class': 'C', 'units': 5}],
+            'update': [{'id': alice['id'], 'units': 70}],
+            'remove': [bob['id']],
+        },
+    })
+    assert response.status_code == 200, response.json
+    assert response.json['changed'] == ['manager_name', 'data']
+    assert response.json['members']['updated'] == [alice['id']]
+    assert response.json['members']['removed'] == [bob['id']]
+
+    saved = client.get(f"/api/agreements/{agreement['id']}").json
+    assert saved['manager_name'] == 'New Manager'
+    assert 'data_key' not in saved['data']
+    assert saved['data']['notes'] == {'tax': 'partnership'}
+    assert {m['name']: m['units'] for m in saved['members']} == {'Alice': 70, 'Carol': 5}
+
+
+def test_unchanged_patch_keeps_the_version(client, agreement):
+    response = _patch(client, agreement, {'version': agreement['version'], 'fields': {'company_name': agreement['company_name']}})
+    assert response.json == {'version': agreement['version'], 'changed': []}
+
+
+@pytest.mark.parametrize('body', [
+    {'fields': {'state': None}},
+    {'data': ['not', 'an', 'object']},
+    {'members': {'update': [{'id': 999999, 'units': 1}]}},
+    {'members': {'add': [{'name': 'No class'}]}},
+    {'members': {'add': [{'name': 'X', 'class': 'A', 'units': 'many'}]}},
+])
+def test_invalid_patches_return_422(client, agreement, body):
+    response = _patch(client, agreement, {'version': agreement['version'], **body})
+    assert response.status_code == 422
+    assert client.get(f"/api/agreements/{agreement['id']}").json['version'] == agreement['version']
+
+
+def test_put_honours_if_match(client, agreement):
+    url = f"/api/agreements/{agreement['id']}"
+    stale = client.put(url, json={'company_name': 'Renamed'}, headers={'If-Match': '"999"'})
+    assert stale.status_code == 409
+
+    response = client.put(url, json={'company_name': 'Renamed'}, headers={'If-Match': f'"{agreement["version"]}"'})
+    assert response.status_code == 200
+    assert response.json['version'] == agreement['version'] + 1
@@ -0,0 +1,52 @@
+import pytest
+
+from services.html_sections import sections_affected_by
+
+DRAFT = {
+    'company_name': 'Draft <Co>',
+    'formation_date': '2024-01-01',
+    'members': [{'name': 'Alice', 'class': 'A', 'units': 10, 'capital_commitment': 1000}],
+}
+
+
+def _names(sections):
+    return [section.name for section in sections]
+
+
+def test_changed_fields_select_the_sections_that_read_them():
+    assert _names(sections_affected_by(['purpose'])) == ['recitals', 'article_2']
+    assert _names(sections_affected_by(['class_a_rights'])) == ['article_3']
+    assert _names(sections_affected_by(['members.0.units'])) == ['article_3', 'signature_page']
+    assert sections_affected_by(['unknown']) == []
+
+
+def test_preview_draft_escapes_and_renders_members(client):
+    response = client.post('/api/preview', json={**DRAFT, 'changed': ['company_name', 'members']})
+    assert response.status_code == 200
+    sections = {s['name']: s['html'] for s in response.json['sections']}
+    assert 'article_4' not in sections
+    assert 'DRAFT &lt;CO&gt;' in sections['title']
+    assert '<td>Alice</td>' in sections['article_3']
+
+
+def test_saved_agreement_preview_as_html(client, make_agreement):
+    agreement = make_agreement()
+    response = client.get(f"/api/agreements/{agreement['id']}/preview?format=html&changed=manager_name")
+    assert response.mimetype == 'text/html'
+    assert response.get_data(as_text=True).startswith('<article class="opag-preview">')
+
+
+@pytest.mark.parametrize('body', [
+    ['not', 'an', 'object'],
+    {**DRAFT, 'members': 'Alice'},
+    {**DRAFT, 'members': ['Alice']},
+    {**DRAFT, 'members': [{'name': 'Alice', 'capital_commitment': '1,000'}]},
+    {**DRAFT, 'formation_date': 20240101},
+    {**DRAFT, 'formation_date': 'January'},
+    {**DRAFT, 'changed': 'purpose'},
+    {**DRAFT, 'changed': [['purpose']]},
+])
+def test_mistyped_drafts_return_400(client, body):
+    response = client.post('/api/preview', json=body)
+    assert response.status_code == 400
+    assert response.json['error']
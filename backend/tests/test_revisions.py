@@ -0,0 +1,108 @@
+import pytest
+
+from models import db, Agreement, AgreementRevision
+from services.bulk_import import import_ndjson
+from services.revisions import apply_delta, diff, revision_state, states_at
+
+
+@pytest.mark.parametrize('old, new', [
+    ({}, {'a': 1}),
+    ({'a': 1, 'b': 2}, {'a': 1}),
+    ({'a': {'b': {'c': 1, 'd': 2}}}, {'a': {'b': {'c': 3}, 'e': []}}),
+    ({'a': {'b': 1}}, {'a': [1, 2]}),
+    ({'a': [1, 2]}, {'a': {'b': 1}}),
+    ({'a': None}, {'a': {'b': None}}),
+])
+def test_apply_delta_inverts_diff(old, new):
+    assert apply_delta(old, diff(old, new)) == new
+
+
+def test_apply_delta_shares_unchanged_branches():
+    old = {'kept': {'x': 1}, 'changed': {'y': 1}}
+    new = apply_delta(old, diff(old, {'kept': {'x': 1}, 'changed': {'y': 2}}))
+    assert new['kept'] is old['kept']
+    assert old['changed'] == {'y': 1}
+
+
+def _saved_state(agreement_id):
+    db.session.expire_all()
+    return revision_state(db.session.get(Agreement, agreement_id))
+
+
+def test_every_revision_replays_to_its_saved_state(app, client, make_agreement):
+    app.config['REVISION_CHECKPOINT_INTERVAL'] = 3
+    agreement = make_agreement()
+    agreement_id = agreement['id']
+    url = f'/api/agreements/{agreement_id}'
+    alice, bob = (m['id'] for m in agreement['members'])
+    expected = {1: _saved_state(agreement_id)}
+
+    edits = [
+        {'fields': {'purpose': 'Hold property'}},
+        {'data': {'notes': {'tax': 'partnership', 'year': 2024}}},
+        {'members': {'add': [{'name': 'Carol', 'class': 'C', 'units': 5}]}},
+        {'members': {'update': [{'id': alice, 'units': 75, 'email': 'alice@example.com'}]}},
+        {'data': {'notes': {'year': None}}, 'fields': {'manager_entity': 'Acme GP LLC'}},
+        {'members': {'remove': [bob]}},
+        {'fields': {'effective_date': '2024-03-01', 'purpose': None}},
+    ]
+    for edit in edits:
+        version = client.get(url).json['version']
+        response = client.patch(url, json={'version': version, **edit})
+        assert response.status_code == 200, response.json
+        expected[response.json['version']] = _saved_state(agreement_id)
+
+    # A full replacement through PUT is recorded too
+    response = client.put(url, json={'company_name': 'Renamed', 'state': 'Nevada'})
+    expected[response.json['version']] = _saved_state(agreement_id)
+
+    assert states_at(agreement_id, list(expected)) == expected
+    for revision, state in expected.items():
+        assert states_at(agreement_id, [revision]) == {revision: state}
+
+    kinds = dict(db.session.execute(
+        db.select(AgreementRevision.revision, AgreementRevision.kind).filter_by(agreement_id=agreement_id)
+    ).all())
+    assert [r for r, kind in sorted(kinds.items()) if kind == 'checkpoint'] == [1, 3, 6, 9]
+
+
+def test_agreement_without_history_starts_with_a_checkpoint(client, make_agreement):
+    agreement = make_agreement()
+    AgreementRevision.query.filter_by(agreement_id=agreement['id']).delete()
+    db.session.commit()
+
+    url = f"/api/agreements/{agreement['id']}"
+    response = client.patch(url, json={'version': agreement['version'], 'fields': {'manager_name': 'New'}})
+    revision = response.json['version']
+    assert AgreementRevision.query.filter_by(agreement_id=agreement['id'], revision=revision).one().kind == 'checkpoint'
+    assert states_at(agreement['id'], [revision])[revision] == _saved_state(agreement['id'])
+
+
+def test_bulk_imported_checkpoint_matches_orm_state(app):
+    line = ('{"company_name": "Bulk", "formation_date": "2024-01-01", "effective_date": "2024-01-02", '
+            '"manager_name": "M", "members": [{"name": "A", "class": "A", "units": 3}]}')
+    agreement_id = next(import_ndjson([line]))['id']
+    assert states_at(agreement_id, [1]) == {1: _saved_state(agreement_id)}
+
+
+def test_revision_endpoints(client, make_agreement):
+    agreement = make_agreement()
+    url = f"/api/agreements/{agreement['id']}"
+    version = agreement['version']
+    for name in ('Second', 'Third'):
+        version = client.patch(url, json={'version': version, 'fields': {'manager_name': name}}).json['version']
+    version = client.patch(url, json={'version': version, 'members': {'add': [{'name': 'Carol', 'class': 'C'}]}}).json['version']
+
+    page = client.get(f'{url}/revisions?limit=2').json
+    assert [r['revision'] for r in page['revisions']] == [4, 3]
+    assert page['revisions'][0]['changed'] == ['members']
+    older = client.get(f"{url}/revisions?limit=2&before={page['next_before']}").json
+    assert [r['revision'] for r in older['revisions']] == [2, 1]
+
+    assert client.get(f'{url}/revisions/2').json['manager_name'] == 'Second'
+    assert client.get(f'{url}/revisions/99').status_code == 404
+
+    changes = client.get(f'{url}/diff?from=1&to=4').json
+    assert changes['fields'] == {'manager_name': {'from': 'Acme Manager', 'to': 'Third'}}
+    assert [m['name'] for m in changes['members']['added']] == ['Carol']
+    assert client.get(f'{url}/diff').json['fields'] == {}
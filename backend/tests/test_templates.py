@@ -0,0 +1,104 @@
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+
+from services import template_registry as registry_module
+from services.template_registry import TemplateExistsError, TemplateRegistry, TemplateValidationError
+
+
+def _docx(body='{{ company_name }}'):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', body)
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def fake_compile(monkeypatch):
+    """Stand in for docxtpl: 'broken' bodies fail to compile, others need company_name"""
+    def undeclared_variables(content):
+        if b'broken' in content:
+            return set(), 'TemplateSyntaxError: unexpected end of template'
+        return {'company_name'}, None
+    monkeypatch.setattr(registry_module, '_undeclared_variables', undeclared_variables)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return TemplateRegistry(str(tmp_path), scan_interval=0)
+
+
+def test_register_refuses_existing_names_unless_overwriting(registry, tmp_path):
+    first = registry.register('letter', _docx('one'))
+    with pytest.raises(TemplateExistsError):
+        registry.register('letter', _docx('two'))
+    assert registry.get('letter').sha256 == first.sha256
+
+    second = registry.register('letter', _docx('two'), overwrite=True)
+    assert registry.get('letter').sha256 == second.sha256 != first.sha256
+    assert os.listdir(tmp_path) == ['letter.docx']
+
+
+@pytest.mark.parametrize('name, content', [
+    ('../escape', _docx()),
+    ('letter', b'not a zip'),
+    ('letter', _docx('broken')),
+])
+def test_register_rejects_invalid_uploads(registry, tmp_path, name, content):
+    with pytest.raises(TemplateValidationError):
+        registry.register(name, content)
+    assert os.listdir(tmp_path) == []
+
+
+def test_refresh_picks_up_changed_files_and_skips_broken_ones(registry, tmp_path):
+    (tmp_path / 'good.docx').write_bytes(_docx())
+    (tmp_path / 'broken.docx').write_bytes(_docx('broken'))
+    (tmp_path / 'notes.txt').write_text('ignored')
+
+    templates = {t.name: t for t in registry.list()}
+    assert sorted(templates) == ['broken', 'good']
+    assert templates['broken'].error.startswith('TemplateSyntaxError')
+    assert templates['good'].variables == {'company_name'}
+
+    (tmp_path / 'good.docx').unlink()
+    assert [t.name for t in registry.list()] == ['broken']
+
+
+def test_refresh_compiles_without_holding_the_lock(registry, tmp_path, monkeypatch):
+    (tmp_path / 'slow.docx').write_bytes(_docx())
+    compiling, release = threading.Event(), threading.Event()
+    compile_template = registry_module._undeclared_variables
+
+    def slow_compile(content):
+        compiling.set()
+        release.wait(5)
+        return compile_template(content)
+    monkeypatch.setattr(registry_module, '_undeclared_variables', slow_compile)
+
+    scan = threading.Thread(target=registry.refresh, kwargs={'force': True})
+    scan.start()
+    assert compiling.wait(5)
+    # The lock is free mid-compile, and an upload made meanwhile survives the scan
+    assert registry._lock.acquire(timeout=1)
+    registry._lock.release()
+    monkeypatch.setattr(registry_module, '_undeclared_variables', compile_template)
+    registry.register('uploaded', _docx())
+    release.set()
+    scan.join()
+
+    assert sorted(registry._templates) == ['slow', 'uploaded']
+
+
+def test_upload_endpoint(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(registry_module.template_registry, 'templates_dir', str(tmp_path))
+    monkeypatch.setattr(registry_module.template_registry, '_templates', {})
+
+    def upload(**form):
+        return client.post('/api/templates', data={'file': (io.BytesIO(_docx()), 'letter.docx'), **form})
+
+    assert upload().status_code == 201
+    assert upload().status_code == 409
+    assert upload(overwrite='true').status_code == 201
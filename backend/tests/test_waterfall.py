@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+from services import waterfall
+from services.waterfall import (
+    WaterfallInputError, member_shares, parse_costs, parse_number, parse_range, run_waterfall, to_json_list
+)
+
+CAPITAL = [600, 400]
+UNITS = [50, 50]
+
+
+def _tier(result, name):
+    return result.tiers[name].tolist()
+
+
+def test_tiers_for_a_single_scenario():
+    # 2,000 exit on 1,000 of capital, 8% preferred for one year, 20% carry
+    result = run_waterfall(CAPITAL, UNITS, [2000], [1], carry=0.2, preferred_return=0.08)
+
+    assert _tier(result, 'return_of_capital') == [1000]
+    assert _tier(result, 'preferred_return') == pytest.approx([80])
+    # Catch-up brings the manager to 20% of the 100 paid above capital so far
+    assert _tier(result, 'catch_up') == pytest.approx([20])
+    assert _tier(result, 'residual_manager') == pytest.approx([180])
+    assert _tier(result, 'residual_members') == pytest.approx([720])
+    assert _tier(result, 'manager_total') == pytest.approx([200])
+    assert _tier(result, 'members_total') == pytest.approx([1800])
+
+    # Return of capital and preferred return by capital, residual by units
+    assert result.member_distributions().tolist() == [pytest.approx([648 + 360, 432 + 360])]
+
+
+def test_manager_ends_with_carry_of_profit_once_caught_up():
+    result = run_waterfall(CAPITAL, UNITS, [1500, 5000, 50000], [3], carry=0.25, preferred_return=0.05)
+    profit = result.tiers['net_proceeds'] - result.tiers['return_of_capital']
+    np.testing.assert_allclose(result.tiers['manager_total'], profit * 0.25)
+    np.testing.assert_allclose(result.tiers['manager_total'] + result.tiers['members_total'], result.tiers['net_proceeds'])
+
+
+def test_exit_below_capital_only_returns_capital():
+    result = run_waterfall(CAPITAL, UNITS, [500], [5])
+    assert result.member_distributions().tolist() == [pytest.approx([300, 200])]
+    assert _tier(result, 'manager_total') == [0]
+
+
+def test_preferred_return_compounds_over_the_holding_period():
+    result = run_waterfall(CAPITAL, UNITS, [10000], [0, 1, 2], preferred_return=0.1)
+    assert _tier(result, 'preferred_return') == pytest.approx([0, 100, 210])
+
+
+def test_costs_come_off_the_top_and_never_go_negative():
+    result = run_waterfall(CAPITAL, UNITS, [2000, 50], [1], cost_rate=0.1, fixed_costs=100)
+    assert _tier(result, 'net_proceeds') == pytest.approx([1700, 0])
+
+
+def test_grid_covers_every_exit_and_year_pair():
+    result = run_waterfall(CAPITAL, UNITS, [1000, 2000, 3000], [1, 5])
+    assert result.scenario_count == 6
+    assert result.exit_values.tolist() == [1000, 1000, 2000, 2000, 3000, 3000]
+    assert result.years.tolist() == [1, 5, 1, 5, 1, 5]
+
+
+def test_member_shares_fall_back_to_capital_without_units():
+    capital_share, ownership = member_shares(CAPITAL, [0, 0])
+    assert ownership.tolist() == pytest.approx([0.6, 0.4])
+    _, ownership = member_shares(CAPITAL, [10, 30])
+    assert ownership.tolist() == pytest.approx([0.25, 0.75])
+    assert capital_share.tolist() == pytest.approx([0.6, 0.4])
+
+
+def test_member_summary_matches_the_full_matrix(monkeypatch):
+    monkeypatch.setattr(waterfall, 'SCENARIO_CHUNK', 7)
+    result = run_waterfall([100, 0, 300], [10, 20, 0], np.linspace(0, 2000, 25), [1, 4], preferred_return=0.06)
+    matrix = result.member_distributions()
+    summary = result.member_summary()
+
+    np.testing.assert_allclose(summary['mean'], matrix.mean(axis=0))
+    np.testing.assert_allclose(summary['min'], matrix.min(axis=0))
+    np.testing.assert_allclose(summary['max'], matrix.max(axis=0))
+    assert np.isnan(summary['mean_multiple'][1])
+
+
+@pytest.mark.parametrize('kwargs', [{'carry': 1.0}, {'carry': -0.1}, {'preferred_return': -0.01}, {'fixed_costs': -1}])
+def test_invalid_terms_are_rejected(kwargs):
+    with pytest.raises(WaterfallInputError):
+        run_waterfall(CAPITAL, UNITS, [1000], [1], **kwargs)
+
+
+def test_negative_years_are_rejected():
+    with pytest.raises(WaterfallInputError):
+        run_waterfall(CAPITAL, UNITS, [1000], [-1])
+
+
+def test_parse_range():
+    assert parse_range(5, 'years', 10).tolist() == [5]
+    assert parse_range({'start': 0, 'stop': 10, 'num': 3}, 'years', 10).tolist() == [0, 5, 10]
+    for value in ({'start': 0, 'stop': 1, 'num': 11}, list(range(11)), ['x'], [float('inf')], {'stop': 1}):
+        with pytest.raises(WaterfallInputError):
+            parse_range(value, 'years', 10)
+
+
+def test_parse_costs_and_numbers():
+    assert parse_costs(None) == (0.0, 0.0)
+    assert parse_costs({'rate': 0.02, 'fixed': '15'}) == (0.02, 15.0)
+    for value in ([0.1], 'x', {'rate': 'high'}, {'fixed': True}, {'rate': float('nan')}):
+        with pytest.raises(WaterfallInputError):
+            parse_costs(value)
+    with pytest.raises(WaterfallInputError, match='carry_percentage must be a number'):
+        parse_number(None, 'carry_percentage')
+
+
+def test_to_json_list_replaces_non_finite_values():
+    assert to_json_list([1.234, np.nan, np.inf]) == [1.23, None, None]
+
+
+def test_waterfall_endpoint(client, make_agreement):
+    agreement = make_agreement()
+    url = f"/api/agreements/{agreement['id']}/waterfall"
+    response = client.post(url, json={
+        'exit_values': [2000], 'years': 1, 'carry_percentage': 20, 'preferred_return': 8, 'include_distributions': True
+    })
+    assert response.status_code == 200, response.json
+    # make_agreement's members hold 60/40 of both capital and units
+    assert [m['mean_distribution'] for m in response.json['members']] == [1080.0, 720.0]
+    assert response.json['scenarios']['manager_total'] == [200.0]
+    assert response.json['distributions'] == [[1080.0, 720.0]]
+
+    for body in ({'years': 1}, {'exit_values': [1], 'transaction_costs': 5}, {'exit_values': [1], 'carry_percentage': 100}):
+        assert client.post(url, json=body).status_code == 400